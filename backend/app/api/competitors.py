@@ -99,6 +99,8 @@ async def force_scan_competitor(
 ):
     """Manually trigger a scan for a competitor."""
     result = await competitor_service.scan_competitor(db=db, competitor_id=competitor_id, user_id=user_id)
+    if result.get("error_type") == "llm_unavailable":
+        raise HTTPException(status_code=503, detail=result["error"])
     if "error" in result:
         raise HTTPException(status_code=400, detail=result["error"])
     return result
@@ -1,11 +1,12 @@
-from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks
+from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.ext.asyncio import AsyncSession
-from pydantic import BaseModel
+from pydantic import BaseModel, field_validator
 from typing import List, Optional, Dict, Any
 from uuid import UUID
 from datetime import datetime
 
 from app.database import get_db
+from app.services.job_queue import job_queue
 from app.services.legal_service import legal_service
 from app.api.auth import get_current_user_optional
 from app.models import ComplianceAlert as ComplianceAlertModel
@@ -22,7 +23,13 @@ class BusinessContext(BaseModel):
     user_id: int
     raw_description: Optional[str] = None
     structured_data: Optional[Dict[str, Any]] = None
-    embedding: Optional[List[str]] = None
+    embedding: Optional[List[float]] = None
+
+    @field_validator("embedding", mode="before")
+    @classmethod
+    def embedding_to_list(cls, value):
+        # Stored as a float32 NumPy array
+        return value.tolist() if hasattr(value, "tolist") else value
 
     class Config:
         from_attributes = True
@@ -78,14 +85,13 @@ async def get_legal_updates(
 
 @router.post("/scan")
 async def force_scan_legal_updates(
-    background_tasks: BackgroundTasks,
     db: AsyncSession = Depends(get_db),
 ):
     """
     Manually trigger a scan for new legal updates.
-    This runs as a background task.
+    The scan is queued for the worker processes.
     """
-    background_tasks.add_task(legal_service.daily_scan_and_process, db)
+    await job_queue.enqueue(db, "legal_scan", {}, dedupe_key="legal_scan")
     return {"message": "Legal update scan initiated in the background."}
 
 @router.get("/compliance-alerts")
@@ -1,7 +1,11 @@
 from fastapi import APIRouter, HTTPException, Depends
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from typing import Optional, List, Dict, Any
 from datetime import datetime, timedelta
+import asyncio
+import json
+import logging
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 
@@ -16,8 +20,12 @@ from app.models import (
 )
 from app.services.llm_service import llm_service
 from app.services.memory_service import memory_service
+from app.services.context_assembler import context_assembler
+from app.services.job_queue import job_queue
 from app.agents.briefing_agent import briefing_agent
 
+logger = logging.getLogger(__name__)
+
 router = APIRouter()
 
 
@@ -81,31 +89,15 @@ class MetricsResponse(BaseModel):
 async def chat_endpoint(message: ChatMessage, db: AsyncSession = Depends(get_db)):
     """Main chat endpoint for AI interactions"""
     try:
-        # Get user
-        result = await db.execute(select(User).where(User.id == message.user_id))
-        user = result.scalar_one_or_none()
-
-        if not user:
-            raise HTTPException(status_code=404, detail="User not found")
-
-        # Get business context
-        result = await db.execute(
-            select(BusinessContext).where(BusinessContext.user_id == message.user_id)
-        )
-        business_context_obj = result.scalar_one_or_none()
-
-        business_context = {}
-        if business_context_obj:
-            business_context = {
-                "business_name": business_context_obj.business_name,
-                "business_type": business_context_obj.business_type,
-                "decision_thresholds": business_context_obj.decision_thresholds,
-            }
+        business_context = await _get_chat_business_context(db, message.user_id)
+        chat_context = await context_assembler.assemble(db, message.user_id, message.message, business_context)
 
         # Process with LLM
         llm_result = await llm_service.process_with_context(
             message=message.message,
             business_context=business_context,
+            conversation_history=chat_context.conversation_history,
+            retrieved_context=chat_context.retrieved_context,
         )
 
         # Store conversation in memory
@@ -128,6 +120,78 @@ async def chat_endpoint(message: ChatMessage, db: AsyncSession = Depends(get_db)
         raise HTTPException(status_code=500, detail=f"Error processing chat: {str(e)}")
 
 
+@router.post("/chat/stream")
+async def chat_stream_endpoint(message: ChatMessage, db: AsyncSession = Depends(get_db)):
+    """Server-Sent Events variant of /chat: streams tokens as they are generated.
+
+    Emits `token` events with {"content": ...}, then a final `done` event with
+    the same fields as ChatResponse, or an `error` event.
+    """
+    business_context = await _get_chat_business_context(db, message.user_id)
+    chat_context = await context_assembler.assemble(db, message.user_id, message.message, business_context)
+
+    async def event_stream():
+        parts = []
+        try:
+            async for delta in llm_service.stream_with_context(
+                message=message.message,
+                business_context=business_context,
+                conversation_history=chat_context.conversation_history,
+                retrieved_context=chat_context.retrieved_context,
+            ):
+                parts.append(delta)
+                yield _sse_event("token", {"content": delta})
+        except Exception as e:
+            logger.error(f"Error streaming chat response: {e}")
+            yield _sse_event("error", {"detail": "Error processing chat"})
+            return
+
+        llm_result = llm_service.build_result("".join(parts), business_context)
+
+        await memory_service.store_conversation(
+            user_id=message.user_id,
+            user_message=message.message,
+            ai_response=llm_result["response"],
+            context=business_context,
+        )
+
+        yield _sse_event("done", llm_result)
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+async def _get_chat_business_context(db: AsyncSession, user_id: int) -> Dict[str, Any]:
+    """Load the user and the business context used in chat prompts"""
+    result = await db.execute(select(User).where(User.id == user_id))
+    user = result.scalar_one_or_none()
+
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+
+    result = await db.execute(
+        select(BusinessContext).where(BusinessContext.user_id == user_id)
+    )
+    business_context_obj = result.scalar_one_or_none()
+
+    business_context = {}
+    if business_context_obj:
+        business_context = {
+            "business_name": business_context_obj.business_name,
+            "business_type": business_context_obj.business_type,
+            "decision_thresholds": business_context_obj.decision_thresholds,
+        }
+    return business_context
+
+
+def _sse_event(event: str, data: Dict[str, Any]) -> str:
+    """Format one Server-Sent Events frame"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
 # ============ Briefing Endpoints ============
 
 @router.get("/v1/briefing/today", response_model=BriefingResponse)
@@ -465,6 +529,25 @@ async def get_performance_metrics(user_id: int, db: AsyncSession = Depends(get_d
         raise HTTPException(status_code=500, detail=f"Error getting performance: {str(e)}")
 
 
+@router.get("/v1/metrics/llm")
+async def get_llm_metrics():
+    """Get LLM gateway metrics (cache hit/miss counters etc.)"""
+    return llm_service.get_stats()
+
+
+@router.get("/v1/metrics/memory")
+async def get_memory_metrics():
+    """Get vector memory metrics (write queue, retention, collection sizes)"""
+    sizes = await asyncio.to_thread(memory_service.collection_sizes)
+    return {**memory_service.get_stats(), "collections": sizes}
+
+
+@router.get("/v1/metrics/jobs")
+async def get_job_metrics(db: AsyncSession = Depends(get_db)):
+    """Get scan job queue metrics (job counts by kind and status)"""
+    return await job_queue.get_stats(db)
+
+
 # ============ User & Business Context Endpoints ============
 
 @router.get("/user/{user_id}")
@@ -24,14 +24,94 @@ class Settings(BaseSettings):
     LLM7_BASE_URL: str = "https://api.llm7.io/v1"
     LLM7_MODEL: str = "gpt-4o-mini"  # Default model
 
+    # LLM response cache (TTLs in seconds, per call site)
+    LLM_CACHE_ENABLED: bool = True
+    LLM_CACHE_MAX_ENTRIES: int = 512
+    LLM_CACHE_TTL_COMPETITOR_SCAN: int = 6 * 3600
+    LLM_CACHE_TTL_LEGAL_ANALYSIS: int = 7 * 24 * 3600
+    LLM_CACHE_TTL_CSV_MAPPING: int = 30 * 24 * 3600
+    LLM_CACHE_TTL_TRENDS: int = 3600
+
+    # LLM gateway limits (0 disables a per-minute budget)
+    LLM_MAX_IN_FLIGHT: int = 4
+    LLM_REQUESTS_PER_MINUTE: int = 60
+    LLM_TOKENS_PER_MINUTE: int = 100000
+
+    # LLM resilience (seconds)
+    LLM_REQUEST_TIMEOUT: float = 60.0
+    LLM_MAX_RETRIES: int = 3
+    LLM_RETRY_BASE_DELAY: float = 1.0
+    LLM_RETRY_MAX_DELAY: float = 20.0
+    LLM_CIRCUIT_FAILURE_THRESHOLD: int = 5
+    LLM_CIRCUIT_RESET_TIMEOUT: float = 60.0
+    LLM_SCAN_DEADLINE: float = 180.0
+
+    # Legal scan: candidate articles analyzed per LLM call (1 disables batching)
+    LEGAL_ANALYSIS_BATCH_SIZE: int = 5
+
+    # Structured output: request response_format=json_object for object schemas
+    LLM_JSON_MODE: bool = True
+
     # Autonomous Features
     ENABLE_AUTONOMOUS_ACTIONS: bool = True
     MORNING_BRIEFING_TIME: str = "06:00"
     DECISION_THRESHOLD_AMOUNT: int = 10000
 
+    # Embeddings (set EMBEDDING_SERVICE_SOCKET to share one model process between workers)
+    EMBEDDING_MODEL: str = "all-MiniLM-L6-v2"
+    EMBEDDING_BACKEND: str = "torch"  # "torch" or "onnx" (int8, see export_onnx_embeddings.py)
+    EMBEDDING_ONNX_PATH: str = "./models/embeddings-int8"
+    EMBEDDING_SERVICE_SOCKET: str = ""
+    EMBEDDING_SERVICE_TIMEOUT: float = 30.0  # seconds before falling back to local encoding
+    EMBEDDING_CACHE_ENABLED: bool = True
+    EMBEDDING_CACHE_MAX_ENTRIES: int = 4096
+    EMBEDDING_WORKERS: int = 1  # threads running model encodes
+    EMBEDDING_BATCH_WINDOW: float = 0.01  # seconds to gather concurrent encodes into one batch
+
+    # Scraping HTTP connection pool
+    SCRAPING_MAX_CONNECTIONS: int = 50
+    SCRAPING_MAX_KEEPALIVE_CONNECTIONS: int = 20
+    SCRAPING_KEEPALIVE_EXPIRY: float = 30.0  # seconds an idle connection is kept per host
+    SCRAPING_PER_HOST_CONCURRENCY: int = 2  # requests in flight to one host
+    SCRAPING_PER_HOST_INTERVAL: float = 0.5  # min seconds between requests to one host
+
+    # Competitor scans
+    SCAN_MAX_CONCURRENCY: int = 20  # competitors scanned at once
+    SCAN_TIMEOUT: float = 240.0  # seconds per competitor scan, fetches and LLM analysis included
+
+    # Adaptive competitor scan schedule (minutes; see ScanScheduler)
+    SCAN_INTERVAL_DEFAULT_MINUTES: int = 120
+    SCAN_INTERVAL_MIN_MINUTES: int = 30
+    SCAN_INTERVAL_MAX_MINUTES: int = 2880
+    SCAN_BACKOFF_FACTOR: float = 2.0  # interval multiplier per unchanged scan (divisor when actions are found)
+    SCAN_ACTIVITY_WINDOW_DAYS: int = 14  # competitors with actions this recent keep at most the default interval
+
+    # Scan job queue (consumed by `python -m app.worker`)
+    WORKER_CONCURRENCY: int = 10  # jobs run at once per worker process
+    WORKER_POLL_INTERVAL: float = 5.0  # seconds between polls when the queue is empty
+    JOB_LEASE_SECONDS: float = 600.0  # a job whose worker stops renewing this is run again
+    JOB_MAX_ATTEMPTS: int = 3  # then the job is dead-lettered
+    JOB_RETRY_BASE_DELAY: float = 60.0
+    JOB_RETRY_MAX_DELAY: float = 3600.0
+    JOB_RETENTION_DAYS: int = 7  # finished jobs are purged after this; dead ones are kept
+
     # Memory
     CHROMADB_PATH: str = "./chroma_data"
     MAX_CONTEXT_TOKENS: int = 8000
+
+    # Memory write-behind queue
+    MEMORY_WRITE_BATCH_SIZE: int = 32
+    MEMORY_WRITE_FLUSH_INTERVAL: float = 1.0  # seconds a partial batch waits
+    MEMORY_WRITE_QUEUE_SIZE: int = 1000
+    MEMORY_WRITE_BLOCK_TIMEOUT: float = 5.0  # seconds a writer waits on a full queue before dropping
+
+    # Conversation memory retention (nightly job)
+    MEMORY_MAX_CONVERSATIONS_PER_USER: int = 500
+    MEMORY_CONVERSATION_TTL_DAYS: int = 180
+    MEMORY_RECENT_WINDOW_DAYS: int = 7  # recent turns are read from this window, unless it has too few
+    MEMORY_COMPACTION_AGE_DAYS: int = 14  # older turns are summarized into digests
+    MEMORY_COMPACTION_CHUNK_SIZE: int = 20  # turns per digest
+    MEMORY_LEXICAL_MAX_TENANTS: int = 1000  # per-user BM25 indexes kept in memory
     
     class Config:
         env_file = ".env"
@@ -3,6 +3,7 @@ from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.future import select
+from sqlalchemy import text
 from app.config import settings
 
 logger = logging.getLogger(__name__)
@@ -22,6 +23,24 @@ async def init_db():
         # await conn.run_sync(Base.metadata.drop_all)
         await conn.run_sync(Base.metadata.create_all)
 
+        # legal_updates.url used to be unique across all users; make it unique per user
+        await conn.execute(text("ALTER TABLE legal_updates DROP CONSTRAINT IF EXISTS legal_updates_url_key"))
+        await conn.execute(text(
+            "CREATE UNIQUE INDEX IF NOT EXISTS uq_legal_updates_user_url ON legal_updates (user_id, url)"
+        ))
+
+        await _migrate_business_context_embeddings(conn)
+
+        # Adaptive competitor scan schedule
+        await conn.execute(text("ALTER TABLE competitors ADD COLUMN IF NOT EXISTS next_scan_at TIMESTAMP WITH TIME ZONE"))
+        await conn.execute(text("ALTER TABLE competitors ADD COLUMN IF NOT EXISTS scan_interval_minutes INTEGER"))
+        await conn.execute(text(
+            "ALTER TABLE competitors ADD COLUMN IF NOT EXISTS unchanged_streak INTEGER NOT NULL DEFAULT 0"
+        ))
+        await conn.execute(text(
+            "CREATE INDEX IF NOT EXISTS ix_competitors_next_scan_at ON competitors (next_scan_at)"
+        ))
+
     # Seed initial data if needed
     async with AsyncSession(engine) as session:
         # Check if a default user exists
@@ -38,6 +57,33 @@ async def init_db():
             await session.commit()
             logger.info("Superuser created")
 
+async def _migrate_business_context_embeddings(conn):
+    """Convert business_contexts.embedding from a string array to float32 bytes (idempotent)"""
+    from app.models.types import Float32Vector
+
+    data_type = (await conn.execute(text(
+        "SELECT data_type FROM information_schema.columns "
+        "WHERE table_name = 'business_contexts' AND column_name = 'embedding'"
+    ))).scalar()
+    if data_type != "ARRAY":
+        return
+
+    logger.info("Migrating business context embeddings to float32 vectors")
+    rows = (await conn.execute(text(
+        "SELECT id, embedding FROM business_contexts WHERE embedding IS NOT NULL"
+    ))).all()
+
+    codec = Float32Vector()
+    await conn.execute(text("ALTER TABLE business_contexts ADD COLUMN embedding_f32 BYTEA"))
+    for row_id, embedding in rows:
+        await conn.execute(
+            text("UPDATE business_contexts SET embedding_f32 = :embedding WHERE id = :id"),
+            {"id": row_id, "embedding": codec.process_bind_param([float(e) for e in embedding], conn.dialect)},
+        )
+    await conn.execute(text("ALTER TABLE business_contexts DROP COLUMN embedding"))
+    await conn.execute(text("ALTER TABLE business_contexts RENAME COLUMN embedding_f32 TO embedding"))
+    logger.info(f"Migrated {len(rows)} business context embeddings")
+
 async def get_db():
     """Dependency for getting database session"""
     async with AsyncSessionLocal() as session:
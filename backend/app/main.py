@@ -17,10 +17,13 @@ from app.api.trends import router as trends_router
 from app.telegram.bot import setup_telegram_bot
 from app.agents.briefing_agent import briefing_agent
 from app.services.legal_service import legal_service
-from app.services.competitor_service import competitor_service
+from app.services.job_queue import job_queue
+from app.services.scan_scheduler import scan_scheduler
+from app.services.scraping_service import scraping_service
+from app.services.llm_service import llm_service
+from app.services.memory_service import memory_service
+from app.services.llm_limiter import Priority, llm_priority
 from app.database import AsyncSession, engine
-from sqlalchemy import select
-from app.models import User, Competitor
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -46,19 +49,27 @@ async def lifespan(app: FastAPI):
     if settings.ENABLE_AUTONOMOUS_ACTIONS:
         scheduler = AsyncIOScheduler()
 
+        # Scheduled jobs run at background LLM priority so interactive chat is served first
+        async def run_morning_briefings():
+            with llm_priority(Priority.BACKGROUND):
+                await briefing_agent.generate_all_briefings()
+
         # Schedule morning briefing
         hour, minute = settings.MORNING_BRIEFING_TIME.split(":")
         scheduler.add_job(
-            briefing_agent.generate_all_briefings,
+            run_morning_briefings,
             CronTrigger(hour=int(hour), minute=int(minute)),
             id="morning_briefing",
             name="Generate morning briefings",
         )
 
+        # Legal and competitor scans run in the worker processes (python -m app.worker);
+        # the API only enqueues them, so running several API replicas doesn't repeat the work
+
         # Schedule daily legal scan
         async def run_daily_legal_scan():
             async with AsyncSession(engine) as session:
-                await legal_service.daily_scan_and_process(session)
+                await job_queue.enqueue(session, "legal_scan", {}, dedupe_key="legal_scan")
 
         scheduler.add_job(
             run_daily_legal_scan,
@@ -67,37 +78,62 @@ async def lifespan(app: FastAPI):
             name="Scan for new legal updates daily",
         )
 
-        # Schedule competitor scanning every 2 hours
-        async def run_competitor_scan():
+        # Enqueue competitors whose adaptive scan interval has elapsed
+        async def enqueue_due_competitor_scans():
             async with AsyncSession(engine) as session:
-                # Get all users
-                result = await session.execute(select(User))
-                users = result.scalars().all()
-
-                for user in users:
-                    # Get all competitors for this user
-                    comp_result = await session.execute(
-                        select(Competitor).where(Competitor.user_id == user.id)
-                    )
-                    competitors = comp_result.scalars().all()
-
-                    # Scan each competitor
-                    for competitor in competitors:
-                        try:
-                            logger.info(f"Scanning competitor {competitor.name} for user {user.id}")
-                            await competitor_service.scan_competitor(session, competitor.id, user.id)
-                        except Exception as e:
-                            logger.error(f"Error scanning competitor {competitor.name}: {e}")
+                await scan_scheduler.enqueue_due(session)
 
         scheduler.add_job(
-            run_competitor_scan,
-            CronTrigger(hour="*/2"),  # Every 2 hours
+            enqueue_due_competitor_scans,
+            CronTrigger(minute="*/10"),
             id="competitor_scan",
-            name="Scan all competitors every 2 hours",
+            name="Enqueue due competitor scans",
+        )
+
+        # Purge expired LLM cache rows nightly
+        scheduler.add_job(
+            llm_service.cache.purge_expired,
+            CronTrigger(hour=3, minute=30),
+            id="llm_cache_purge",
+            name="Purge expired LLM cache entries",
+        )
+
+        # Compact and trim conversation memory nightly
+        async def run_memory_retention():
+            with llm_priority(Priority.BACKGROUND):
+                await memory_service.apply_retention()
+
+        scheduler.add_job(
+            run_memory_retention,
+            CronTrigger(hour=4, minute=0),
+            id="memory_retention",
+            name="Compact and trim conversation memory",
+        )
+
+        async def purge_scan_jobs():
+            async with AsyncSession(engine) as session:
+                await job_queue.purge_finished(session)
+
+        scheduler.add_job(
+            purge_scan_jobs,
+            CronTrigger(hour=3, minute=50),
+            id="scan_job_purge",
+            name="Purge finished scan jobs",
+        )
+
+        async def purge_legal_verdicts():
+            async with AsyncSession(engine) as session:
+                await legal_service.purge_expired_verdicts(session)
+
+        scheduler.add_job(
+            purge_legal_verdicts,
+            CronTrigger(hour=3, minute=40),
+            id="legal_verdict_purge",
+            name="Purge expired legal analysis verdicts",
         )
 
         scheduler.start()
-        logger.info(f"Scheduler started - Morning briefings at {settings.MORNING_BRIEFING_TIME}, Daily legal scan at 5:00, Competitor scan every 2 hours")
+        logger.info(f"Scheduler started - Morning briefings at {settings.MORNING_BRIEFING_TIME}, Daily legal scan at 5:00, Due competitor scans enqueued every 10 minutes")
 
     yield
 
@@ -105,6 +141,12 @@ async def lifespan(app: FastAPI):
     if scheduler:
         scheduler.shutdown()
 
+    # Write out buffered memory documents
+    await memory_service.close(timeout=30)
+
+    # Close pooled scraping connections
+    await scraping_service.aclose()
+
     logger.info("Shutting down...")
 
 app = FastAPI(
@@ -10,6 +10,11 @@ from .processed_article import ProcessedArticle
 from .finance import FinancialTransaction, CashFlowPrediction
 from .market_trend import MarketTrend
 from .compliance_alert import ComplianceAlert
+from .llm_cache_entry import LLMCacheEntry
+from .legal_analysis_cache import LegalAnalysisCacheEntry
+from .embedding_cache_entry import EmbeddingCacheEntry
+from .competitor_source_state import CompetitorSourceState
+from .scan_job import ScanJob
 
 __all__ = [
     "User",
@@ -26,4 +31,9 @@ __all__ = [
     "CashFlowPrediction",
     "MarketTrend",
     "ComplianceAlert",
+    "LLMCacheEntry",
+    "LegalAnalysisCacheEntry",
+    "EmbeddingCacheEntry",
+    "CompetitorSourceState",
+    "ScanJob",
 ]
@@ -1,6 +1,7 @@
-from sqlalchemy import Column, Integer, String, JSON, ForeignKey, DateTime, Text, ARRAY
+from sqlalchemy import Column, Integer, String, JSON, ForeignKey, DateTime, Text
 from sqlalchemy.sql import func
 from app.database import Base
+from app.models.types import Float32Vector
 
 class BusinessContext(Base):
     __tablename__ = "business_contexts"
@@ -21,7 +22,7 @@ class BusinessContext(Base):
     # Legal service fields
     raw_description = Column(Text, nullable=True)
     structured_data = Column(JSON, nullable=True)
-    embedding = Column(ARRAY(String), nullable=True)
+    embedding = Column(Float32Vector, nullable=True)
 
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
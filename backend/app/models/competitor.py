@@ -18,6 +18,11 @@ class Competitor(Base):
     last_scanned = Column(DateTime(timezone=True), nullable=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
+    # Adaptive scan schedule (see ScanScheduler); NULL means due now / default interval
+    next_scan_at = Column(DateTime(timezone=True), nullable=True, index=True)
+    scan_interval_minutes = Column(Integer, nullable=True)
+    unchanged_streak = Column(Integer, nullable=False, default=0, server_default="0")
+
 class CompetitorAction(Base):
     __tablename__ = "competitor_actions"
 
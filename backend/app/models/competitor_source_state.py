@@ -0,0 +1,21 @@
+from sqlalchemy import Column, String, DateTime, ForeignKey, JSON
+from sqlalchemy.dialects.postgresql import UUID
+from app.database import Base
+
+class CompetitorSourceState(Base):
+    __tablename__ = "competitor_source_states"
+
+    competitor_id = Column(UUID(as_uuid=True), ForeignKey("competitors.id"), primary_key=True)
+    source = Column(String, primary_key=True) # 'website', 'telegram'
+
+    # Website URL or Telegram channel the state below belongs to; reset if it changes
+    url = Column(String, nullable=False)
+    etag = Column(String, nullable=True)
+    last_modified = Column(String, nullable=True)
+    # sha256 of the normalized text that was last analyzed
+    fingerprint = Column(String(64), nullable=True)
+    # Text blocks of that content, to send only added/changed blocks next time
+    blocks = Column(JSON, nullable=True)
+
+    checked_at = Column(DateTime(timezone=True), nullable=True)
+    changed_at = Column(DateTime(timezone=True), nullable=True)
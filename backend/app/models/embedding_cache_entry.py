@@ -0,0 +1,14 @@
+from sqlalchemy import Column, String, DateTime
+from sqlalchemy.sql import func
+from app.database import Base
+from app.models.types import Float32Vector
+
+class EmbeddingCacheEntry(Base):
+    __tablename__ = "embedding_cache"
+
+    model = Column(String, primary_key=True)
+    # sha256 of the encoded text
+    text_hash = Column(String(64), primary_key=True)
+    vector = Column(Float32Vector, nullable=False)
+
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
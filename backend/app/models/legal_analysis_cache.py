@@ -0,0 +1,16 @@
+from sqlalchemy import Column, String, DateTime, JSON
+from sqlalchemy.sql import func
+from app.database import Base
+
+class LegalAnalysisCacheEntry(Base):
+    __tablename__ = "legal_analysis_cache"
+
+    # sha256 of the article URL
+    url_hash = Column(String(64), primary_key=True)
+    # sha256 of the normalized business profile (industry, type, legal form, location)
+    context_fingerprint = Column(String(64), primary_key=True)
+
+    verdict = Column(JSON, nullable=False)
+
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    expires_at = Column(DateTime(timezone=True), nullable=False, index=True)
@@ -1,17 +1,21 @@
 import uuid
-from sqlalchemy import Column, Integer, String, JSON, ForeignKey, DateTime, Text
+from sqlalchemy import Column, Integer, String, JSON, ForeignKey, DateTime, Text, UniqueConstraint
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.sql import func
 from app.database import Base
 
 class LegalUpdate(Base):
     __tablename__ = "legal_updates"
+    __table_args__ = (
+        # The same article can be relevant to many users
+        UniqueConstraint("user_id", "url", name="uq_legal_updates_user_url"),
+    )
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     
     title = Column(String, nullable=False)
-    url = Column(String, unique=True, nullable=False)
+    url = Column(String, nullable=False)
     source = Column(String, nullable=False)
     
     summary = Column(Text, nullable=False)
@@ -0,0 +1,14 @@
+from sqlalchemy import Column, String, DateTime, Text
+from sqlalchemy.sql import func
+from app.database import Base
+
+class LLMCacheEntry(Base):
+    __tablename__ = "llm_cache_entries"
+
+    # sha256 of (model, messages, temperature, max_tokens, response_format)
+    key = Column(String(64), primary_key=True)
+    model = Column(String, nullable=False)
+    response = Column(Text, nullable=False)
+
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    expires_at = Column(DateTime(timezone=True), nullable=False, index=True)
@@ -0,0 +1,39 @@
+import uuid
+from sqlalchemy import Column, Integer, String, JSON, DateTime, Text, Index, text
+from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.sql import func
+from app.database import Base
+
+class ScanJob(Base):
+    __tablename__ = "scan_jobs"
+    __table_args__ = (
+        # At most one pending/running job per dedupe key; finished jobs don't block new ones
+        Index(
+            "uq_scan_jobs_active_dedupe_key",
+            "dedupe_key",
+            unique=True,
+            postgresql_where=text("status IN ('pending', 'running')"),
+        ),
+        # Claim query: runnable pending jobs in order
+        Index("ix_scan_jobs_status_run_after", "status", "run_after"),
+    )
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+
+    kind = Column(String, nullable=False) # 'competitor_scan', 'legal_scan'
+    payload = Column(JSON, nullable=False, default=dict)
+    dedupe_key = Column(String, nullable=True)
+
+    status = Column(String, nullable=False, default="pending") # 'pending', 'running', 'done', 'dead'
+    attempts = Column(Integer, nullable=False, default=0)
+    max_attempts = Column(Integer, nullable=False, default=3)
+    run_after = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+
+    # Lease held by the worker running the job; expired leases are reclaimed
+    locked_by = Column(String, nullable=True)
+    lease_expires_at = Column(DateTime(timezone=True), nullable=True)
+
+    last_error = Column(Text, nullable=True)
+
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    finished_at = Column(DateTime(timezone=True), nullable=True)
@@ -0,0 +1,24 @@
+import numpy as np
+from sqlalchemy import LargeBinary
+from sqlalchemy.types import TypeDecorator
+
+
+class Float32Vector(TypeDecorator):
+    """Dense float vector stored as little-endian float32 bytes (bytea).
+
+    Values are read back as read-only NumPy arrays that share the fetched
+    buffer, so no per-element parsing happens on load.
+    """
+
+    impl = LargeBinary
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        if value is None:
+            return None
+        return np.asarray(value, dtype="<f4").tobytes()
+
+    def process_result_value(self, value, dialect):
+        if value is None:
+            return None
+        return np.frombuffer(value, dtype="<f4")
@@ -0,0 +1,41 @@
+from difflib import SequenceMatcher
+from typing import List, Sequence
+
+
+def diff_blocks(previous: Sequence[str], current: Sequence[str], context: int = 1) -> List[str]:
+    """
+    Block-level diff of two snapshots of a page, for the LLM
+
+    Returns added blocks as "+ block" and changed blocks as their old
+    version ("- block") followed by the new one, each hunk with up to
+    `context` unchanged neighbours ("  block") so headings like "Цены"
+    stay attached. Removed blocks are left out: scans look for new
+    promotions, prices and products. Blocks whose text is already in
+    `previous` only moved, so they are context, not additions. An empty
+    list means nothing was added or changed.
+    """
+    seen = set(previous)
+    matcher = SequenceMatcher(None, list(previous), list(current), autojunk=False)
+    hunks = [
+        op for op in matcher.get_opcodes()
+        if op[0] in ("insert", "replace") and any(block not in seen for block in current[op[3]:op[4]])
+    ]
+    lines: List[str] = []
+    emitted = 0  # blocks of `current` before this index are already in `lines`
+
+    for n, (tag, i1, i2, j1, j2) in enumerate(hunks):
+        start = max(j1 - context, emitted)
+        if lines and start > emitted:
+            lines.append("  ...")
+        lines.extend(f"  {block}" for block in current[start:j1])
+
+        if tag == "replace":
+            lines.extend(f"- {block}" for block in previous[i1:i2])
+        lines.extend(f"  {block}" if block in seen else f"+ {block}" for block in current[j1:j2])
+
+        next_start = hunks[n + 1][3] if n + 1 < len(hunks) else len(current)
+        end = min(j2 + context, next_start)
+        lines.extend(f"  {block}" for block in current[j2:end])
+        emitted = end
+
+    return lines
@@ -1,17 +1,56 @@
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 from sqlalchemy import delete
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Literal, Tuple
 from uuid import UUID
+from datetime import datetime
+from pydantic import BaseModel
 import json
 import logging
 
-from app.models import Competitor, CompetitorAction
+from app.config import settings
+from app.models import Competitor, CompetitorAction, CompetitorSourceState
 from app.services.llm_service import llm_service
-from app.services.scraping_service import scraping_service
+from app.services.llm_resilience import LLMError
+from app.services.structured_output import StructuredOutputError
+from app.services.scraping_service import scraping_service, fingerprint_text
+from app.services.block_diff import diff_blocks
+from app.services.scan_scheduler import scan_scheduler
 
 logger = logging.getLogger(__name__)
 
+SOURCE_TITLES = {"website": "Website Content", "telegram": "Telegram Channel Posts"}
+
+
+# LLM output schemas
+class DetectedActionDetails(BaseModel):
+    title: str = ""
+    description: str = ""
+
+
+class DetectedAction(BaseModel):
+    action_type: Literal["price_change", "new_promotion", "new_product"]
+    details: DetectedActionDetails
+
+
+class CompetitorScanAnalysis(BaseModel):
+    actions: List[DetectedAction] = []
+
+
+class BenchmarkScore(BaseModel):
+    us: float
+    competitor_avg: float
+
+
+class CompetitorInsights(BaseModel):
+    summary: str
+    overall_position: str
+    market_share: str
+    price_index: str
+    growth_rate: str
+    benchmarks: Dict[str, BenchmarkScore] = {}
+
+
 class CompetitorService:
     async def get(self, db: AsyncSession, competitor_id: UUID, user_id: int) -> Optional[Competitor]:
         result = await db.execute(
@@ -37,6 +76,7 @@ class CompetitorService:
         if not competitor:
             return False
         await db.execute(delete(CompetitorAction).where(CompetitorAction.competitor_id == competitor_id))
+        await db.execute(delete(CompetitorSourceState).where(CompetitorSourceState.competitor_id == competitor_id))
         await db.delete(competitor)
         await db.commit()
         return True
@@ -58,29 +98,34 @@ class CompetitorService:
         if not competitor:
             return {"error": "Конкурент не найден", "error_type": "not_found"}
 
-        content_parts = []
+        states = await self._load_source_states(db, competitor_id)
+        fetched = []  # (source, target, scrape result)
         errors = []
 
         # 1. Scrape website content if URL exists
         if competitor.website_url:
             logger.info(f"Scraping website: {competitor.website_url}")
-            website_result = await scraping_service.fetch_url_content(competitor.website_url)
+            etag, last_modified = self._validators(states.get("website"), competitor.website_url)
+            website_result = await scraping_service.fetch_url_content(competitor.website_url, etag, last_modified)
             if website_result["success"]:
-                content_parts.append(f"=== Website Content ===\n{website_result['content'][:6000]}")
+                fetched.append(("website", competitor.website_url, website_result))
             else:
                 errors.append(f"Сайт: {website_result['error']}")
 
         # 2. Scrape Telegram channel if specified
         if competitor.telegram_channel:
             logger.info(f"Scraping Telegram channel: {competitor.telegram_channel}")
-            telegram_result = await scraping_service.fetch_telegram_channel_content(competitor.telegram_channel)
+            etag, last_modified = self._validators(states.get("telegram"), competitor.telegram_channel)
+            telegram_result = await scraping_service.fetch_telegram_channel_content(
+                competitor.telegram_channel, etag, last_modified
+            )
             if telegram_result["success"]:
-                content_parts.append(f"=== Telegram Channel Posts ===\n{telegram_result['content'][:6000]}")
+                fetched.append(("telegram", competitor.telegram_channel, telegram_result))
             else:
                 errors.append(f"Telegram: {telegram_result['error']}")
 
         # 3. Check if we have any content
-        if not content_parts:
+        if not fetched:
             error_details = "; ".join(errors) if errors else "Не удалось получить данные ни из одного источника"
             return {
                 "error": f"Не удалось проанализировать конкурента. {error_details}",
@@ -88,28 +133,72 @@ class CompetitorService:
                 "details": errors
             }
 
-        content = "\n\n".join(content_parts)[:12000]
+        # 4. Only analyze sources that changed since their last analysis (not a 304, new fingerprint),
+        #    and of those only the added/changed blocks if we have the previous snapshot
+        fingerprints = {}
+        content_parts = []
+        has_diffs = False
+        for source, target, result in fetched:
+            if result["not_modified"]:
+                continue
+            fingerprint = fingerprint_text(result["content"])
+            state = states.get(source)
+            known = state is not None and state.url == target
+            if known and state.fingerprint == fingerprint:
+                continue
+            fingerprints[source] = fingerprint
+
+            if known and state.blocks:
+                changes = diff_blocks(state.blocks, result["blocks"])
+                if changes:
+                    content_parts.append(f"=== {SOURCE_TITLES[source]}: Changes Since Last Scan ===\n" + "\n".join(changes)[:6000])
+                    has_diffs = True
+                # else: blocks were only removed or reordered, nothing new to analyze
+            else:
+                content_parts.append(f"=== {SOURCE_TITLES[source]} ===\n{result['content'][:6000]}")
+
+        now = datetime.now()
+        if not content_parts:
+            logger.info(f"No changes for competitor {competitor.name}, skipping analysis")
+            self._remember_sources(db, states, competitor_id, fetched, fingerprints, now)
+            competitor.last_scanned = now
+            result = {
+                "success": True,
+                "unchanged": True,
+                "actions": [],
+                "found_actions": 0,
+                "message": "Изменений не обнаружено"
+            }
+            await scan_scheduler.reschedule(db, competitor, result)
+            await db.commit()
+            return result
 
-        # Update last_scanned timestamp
-        from datetime import datetime
-        competitor.last_scanned = datetime.now()
+        content = "\n\n".join(content_parts)[:12000]
+        diff_note = (
+            "Sections titled 'Changes Since Last Scan' list only what changed: lines starting with '+' are new, "
+            "'-' is the previous version of a changed line, other lines are context. "
+            "Only report actions found in the '+' lines."
+        ) if has_diffs else ""
 
         # 2. Use LLM to analyze the data
         prompt = f"""
         Analyze the following text scraped from the website of a competitor named '{competitor.name}'.
         Identify any promotions, price changes, or new products.
-        Respond in a structured JSON format. If nothing is found, return an empty list [].
+        {diff_note}
+        Respond in a structured JSON format. If nothing is found, return {{"actions": []}}.
 
         JSON format:
-        [
-          {{
-            "action_type": "price_change" | "new_promotion" | "new_product",
-            "details": {{
-              "title": "A short title for the action/product",
-              "description": "A detailed description, including discount size, conditions, product name, etc."
+        {{
+          "actions": [
+            {{
+              "action_type": "price_change" | "new_promotion" | "new_product",
+              "details": {{
+                "title": "A short title for the action/product",
+                "description": "A detailed description, including discount size, conditions, product name, etc."
+              }}
             }}
-          }}
-        ]
+          ]
+        }}
 
         Text to analyze:
         ---
@@ -118,45 +207,55 @@ class CompetitorService:
         """
 
         messages = [{"role": "user", "content": prompt}]
-        llm_response_str = await llm_service._call_llm(messages)
-
-        # 3. Parse the response and save actions
         try:
-            actions = json.loads(llm_response_str)
-            if not isinstance(actions, list):
-                logger.error("LLM returned non-list data for competitor scan")
-                await db.commit()  # Commit the last_scanned update
-                return {
-                    "success": True,
-                    "actions": [],
-                    "found_actions": 0,
-                    "message": "Сканирование завершено, изменений не обнаружено"
-                }
+            # A truncated action list would be stored as the complete analysis of this content
+            analysis = await llm_service.generate_structured(
+                messages,
+                CompetitorScanAnalysis,
+                cache_ttl=settings.LLM_CACHE_TTL_COMPETITOR_SCAN,
+                allow_truncated=False,
+            )
+        except StructuredOutputError as e:
+            logger.error(f"Failed to parse competitor analysis for {competitor.name}: {e}")
+            return {
+                "success": False,
+                "error": "Ошибка при анализе AI",
+                "error_type": "llm_parse_error"
+            }
+        except LLMError as e:
+            # Leave last_scanned untouched so the competitor is picked up again
+            logger.warning(f"Skipping analysis of competitor {competitor.name}: {e}")
+            return {
+                "success": False,
+                "error": "AI-сервис временно недоступен, попробуйте позже",
+                "error_type": "llm_unavailable",
+            }
+
+        # Update last_scanned timestamp; new fingerprints are stored only now that the content was analyzed
+        competitor.last_scanned = now
+        self._remember_sources(db, states, competitor_id, fetched, fingerprints, now)
 
+        # 3. Save actions
+        try:
+            actions = [action.model_dump() for action in analysis.actions]
             for action_data in actions:
                 new_action = CompetitorAction(
                     competitor_id=competitor_id,
-                    action_type=action_data.get("action_type"),
-                    details=action_data.get("details"),
+                    action_type=action_data["action_type"],
+                    details=action_data["details"],
                 )
                 db.add(new_action)
 
-            await db.commit()
-            return {
+            result = {
                 "success": True,
                 "actions": actions,
                 "found_actions": len(actions),
                 "message": f"Найдено {len(actions)} изменений" if actions else "Изменений не обнаружено"
             }
+            await scan_scheduler.reschedule(db, competitor, result)
+            await db.commit()
+            return result
 
-        except json.JSONDecodeError:
-            logger.error(f"Failed to decode LLM JSON response: {llm_response_str}")
-            await db.commit()  # Commit the last_scanned update
-            return {
-                "success": False,
-                "error": "Ошибка при анализе AI",
-                "error_type": "llm_parse_error"
-            }
         except Exception as e:
             logger.error(f"Error saving competitor actions: {e}")
             await db.rollback()
@@ -166,6 +265,48 @@ class CompetitorService:
                 "error_type": "database_error"
             }
 
+    async def _load_source_states(self, db: AsyncSession, competitor_id: UUID) -> Dict[str, CompetitorSourceState]:
+        result = await db.execute(
+            select(CompetitorSourceState).where(CompetitorSourceState.competitor_id == competitor_id)
+        )
+        return {state.source: state for state in result.scalars().all()}
+
+    @staticmethod
+    def _validators(state: Optional[CompetitorSourceState], target: str) -> Tuple[Optional[str], Optional[str]]:
+        """ETag/Last-Modified for a conditional fetch, only if that exact content was analyzed before"""
+        if state is None or state.url != target or state.fingerprint is None:
+            return None, None
+        return state.etag, state.last_modified
+
+    @staticmethod
+    def _remember_sources(
+        db: AsyncSession,
+        states: Dict[str, CompetitorSourceState],
+        competitor_id: UUID,
+        fetched: List[Tuple[str, str, Dict[str, Any]]],
+        fingerprints: Dict[str, str],
+        now: datetime,
+    ):
+        """Store validators and fingerprints of the fetched sources; `fingerprints` holds the changed ones"""
+        for source, target, result in fetched:
+            state = states.get(source)
+            if state is None:
+                state = CompetitorSourceState(competitor_id=competitor_id, source=source, url=target)
+                db.add(state)
+                states[source] = state
+            elif state.url != target:
+                state.url = target
+                state.fingerprint = None
+
+            if not result["not_modified"]:
+                state.etag = result.get("etag")
+                state.last_modified = result.get("last_modified")
+            if source in fingerprints:
+                state.fingerprint = fingerprints[source]
+                state.blocks = result["blocks"]
+                state.changed_at = now
+            state.checked_at = now
+
     async def get_insights(self, db: AsyncSession, user_id: int) -> dict:
         """Generate competitive intelligence insights based on actual competitors"""
         try:
@@ -234,16 +375,15 @@ class CompetitorService:
 }}"""
 
             messages = [{"role": "user", "content": prompt}]
-            llm_response = await llm_service._call_llm(messages)
 
             # Parse AI response
             try:
-                insights = json.loads(llm_response)
+                insights = (await llm_service.generate_structured(messages, CompetitorInsights)).model_dump()
                 # Add competitor names for frontend
                 insights["competitor_names"] = [c["name"] for c in competitor_data]
                 return insights
-            except json.JSONDecodeError:
-                logger.error(f"Failed to parse insights JSON: {llm_response}")
+            except LLMError as e:
+                logger.error(f"Failed to get insights from LLM: {e}")
                 # Return reasonable defaults if parsing fails
                 return {
                     "summary": f"Отслеживается {len(competitors)} конкурент(ов). Обнаружено {len(all_actions)} изменений. Данные анализируются.",
@@ -0,0 +1,173 @@
+import logging
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, NamedTuple, Optional
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.models import Competitor, CompetitorAction, LegalUpdate
+from app.services.llm_service import llm_service
+from app.services.memory_service import memory_service
+
+logger = logging.getLogger(__name__)
+
+# Tokens added per chat message by the chat format
+MESSAGE_OVERHEAD_TOKENS = 4
+
+
+class TokenCounter:
+    """Counts prompt tokens with tiktoken, or ~3 chars/token (Cyrillic-heavy text) without it"""
+
+    def __init__(self):
+        self._encoding = None
+        self._loaded = False
+
+    def _get_encoding(self):
+        # Loaded on first use, not at import: a cold tiktoken cache downloads the BPE file
+        # (the Docker image pre-caches it in TIKTOKEN_CACHE_DIR)
+        if not self._loaded:
+            self._loaded = True
+            try:
+                import tiktoken
+
+                try:
+                    self._encoding = tiktoken.encoding_for_model(settings.LLM7_MODEL)
+                except KeyError:
+                    self._encoding = tiktoken.get_encoding("o200k_base")
+            except Exception as e:
+                logger.info(f"tiktoken unavailable, estimating tokens from length: {e}")
+        return self._encoding
+
+    def count(self, text: str) -> int:
+        if not text:
+            return 0
+        encoding = self._get_encoding()
+        if encoding is not None:
+            return len(encoding.encode(text, disallowed_special=()))
+        return len(text) // 3 + 1
+
+    def count_messages(self, messages: List[Dict[str, str]]) -> int:
+        return sum(self.count(m["content"]) + MESSAGE_OVERHEAD_TOKENS for m in messages)
+
+
+class ChatContext(NamedTuple):
+    conversation_history: List[Dict[str, str]]
+    retrieved_context: Optional[str]
+    tokens: int
+
+
+class ContextAssembler:
+    """
+    Builds the chat prompt context under settings.MAX_CONTEXT_TOKENS
+
+    The system prompt and the user's message always go in. The remaining
+    budget is filled greedily, in priority order, with: the last few turns,
+    memory hits for the message, recent legal updates and competitor
+    actions, then older turns.
+    """
+
+    def __init__(self, recent_turns: int = 10, always_recent_turns: int = 2, memory_hits: int = 5, recent_items: int = 5):
+        self.recent_turns = recent_turns
+        self.always_recent_turns = always_recent_turns
+        self.memory_hits = memory_hits
+        self.recent_items = recent_items
+        self.tokens = TokenCounter()
+
+    async def assemble(
+        self,
+        db: AsyncSession,
+        user_id: int,
+        message: str,
+        business_context: Optional[Dict[str, Any]] = None,
+        max_tokens: Optional[int] = None,
+    ) -> ChatContext:
+        budget = max_tokens or settings.MAX_CONTEXT_TOKENS
+        used = self.tokens.count_messages(llm_service.build_messages(message, business_context))
+
+        turns = await memory_service.get_recent_conversations(user_id, self.recent_turns)
+        hits = await memory_service.hybrid_search(user_id, message, self.memory_hits)
+        items = await self._recent_items(db, user_id)
+
+        # Candidates in priority order: (kind, index or text)
+        recent_contents = {turn["content"] for turn in turns}
+        newest_first = list(range(len(turns) - 1, -1, -1))
+        candidates = (
+            [("turn", i) for i in newest_first[:self.always_recent_turns]]
+            + [("info", f"- Past conversation: {hit['content']}") for hit in hits if hit["content"] not in recent_contents]
+            + [("info", item) for item in items]
+            + [("turn", i) for i in newest_first[self.always_recent_turns:]]
+        )
+
+        selected_turns = set()
+        info_lines: List[str] = []
+        for kind, value in candidates:
+            if kind == "turn":
+                cost = self.tokens.count_messages(self._turn_messages(turns[value]["content"]))
+            else:
+                # The section header is paid for by the first line
+                cost = self.tokens.count(value) + (0 if info_lines else 20)
+            if used + cost > budget:
+                continue
+
+            used += cost
+            if kind == "turn":
+                selected_turns.add(value)
+            else:
+                info_lines.append(value)
+
+        history = []
+        for i in sorted(selected_turns):
+            history.extend(self._turn_messages(turns[i]["content"]))
+
+        return ChatContext(
+            conversation_history=history,
+            retrieved_context="\n".join(info_lines) or None,
+            tokens=used,
+        )
+
+    @staticmethod
+    def _turn_messages(content: str) -> List[Dict[str, str]]:
+        """Split a stored "User: ...\\nAssistant: ..." turn back into chat messages"""
+        user_part, sep, assistant_part = content.partition("\nAssistant: ")
+        if not sep:
+            return [{"role": "assistant", "content": content}]
+        return [
+            {"role": "user", "content": user_part.removeprefix("User: ")},
+            {"role": "assistant", "content": assistant_part},
+        ]
+
+    async def _recent_items(self, db: AsyncSession, user_id: int) -> List[str]:
+        """Latest legal updates and competitor actions for the user, as prompt lines"""
+        since = datetime.now() - timedelta(days=14)
+        lines = []
+        try:
+            legal = await db.execute(
+                select(LegalUpdate)
+                .where(LegalUpdate.user_id == user_id, LegalUpdate.detected_at >= since)
+                .order_by(LegalUpdate.detected_at.desc())
+                .limit(self.recent_items)
+            )
+            for update in legal.scalars().all():
+                lines.append(f"- Legal update ({update.impact_level} impact): {update.title}. {update.summary}")
+
+            actions = await db.execute(
+                select(CompetitorAction, Competitor.name)
+                .join(Competitor, CompetitorAction.competitor_id == Competitor.id)
+                .where(Competitor.user_id == user_id, CompetitorAction.detected_at >= since)
+                .order_by(CompetitorAction.detected_at.desc())
+                .limit(self.recent_items)
+            )
+            for action, competitor_name in actions.all():
+                details = action.details or {}
+                lines.append(
+                    f"- Competitor {competitor_name} ({action.action_type}): "
+                    f"{details.get('title', '')}. {details.get('description', '')}"
+                )
+        except Exception as e:
+            logger.error(f"Error loading recent items for chat context: {e}")
+        return lines
+
+
+# Singleton instance
+context_assembler = ContextAssembler()
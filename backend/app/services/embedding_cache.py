@@ -0,0 +1,94 @@
+import hashlib
+import logging
+from typing import Dict, Any, List
+
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert
+
+from app.database import AsyncSessionLocal
+from app.models import EmbeddingCacheEntry
+from app.services.lru_cache import LRUCache
+
+logger = logging.getLogger(__name__)
+
+
+class EmbeddingCache:
+    """Cache of text embeddings keyed on (model, sha256(text)).
+
+    Two tiers like the LLM response cache: an in-process LRU and the
+    application database. Embeddings are deterministic, so entries never
+    expire; switching models simply misses.
+    """
+
+    def __init__(self, model_name: str, max_entries: int = 4096, enabled: bool = True):
+        self.model_name = model_name
+        self.enabled = enabled
+        self._memory = LRUCache(max_entries)
+        self._stats = {"memory_hits": 0, "db_hits": 0, "misses": 0, "stores": 0, "errors": 0}
+
+    @staticmethod
+    def make_key(text: str) -> str:
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+    async def get_many(self, keys: List[str]) -> Dict[str, np.ndarray]:
+        """Look up embeddings, promoting database hits into memory"""
+        found = {}
+        for key in keys:
+            vector = self._memory.get(key)
+            if vector is not None:
+                found[key] = vector
+        self._stats["memory_hits"] += len(found)
+
+        missing = [key for key in set(keys) if key not in found]
+        if missing:
+            try:
+                async with AsyncSessionLocal() as session:
+                    result = await session.execute(
+                        select(EmbeddingCacheEntry.text_hash, EmbeddingCacheEntry.vector).where(
+                            EmbeddingCacheEntry.model == self.model_name,
+                            EmbeddingCacheEntry.text_hash.in_(missing),
+                        )
+                    )
+                    rows = result.all()
+                for key, vector in rows:
+                    self._memory.set(key, vector)
+                    found[key] = vector
+                self._stats["db_hits"] += len(rows)
+            except Exception as e:
+                self._stats["errors"] += 1
+                logger.warning(f"Embedding cache lookup failed: {e}")
+
+        self._stats["misses"] += len(set(keys) - found.keys())
+        return found
+
+    async def set_many(self, vectors: Dict[str, np.ndarray]):
+        """Store embeddings in both tiers"""
+        for key, vector in vectors.items():
+            self._memory.set(key, vector)
+        self._stats["stores"] += len(vectors)
+
+        try:
+            async with AsyncSessionLocal() as session:
+                await session.execute(
+                    insert(EmbeddingCacheEntry)
+                    .values([
+                        {"model": self.model_name, "text_hash": key, "vector": vector}
+                        for key, vector in vectors.items()
+                    ])
+                    .on_conflict_do_nothing()
+                )
+                await session.commit()
+        except Exception as e:
+            self._stats["errors"] += 1
+            logger.warning(f"Embedding cache store failed: {e}")
+
+    def get_stats(self) -> Dict[str, Any]:
+        hits = self._stats["memory_hits"] + self._stats["db_hits"]
+        lookups = hits + self._stats["misses"]
+        return {
+            **self._stats,
+            "hit_rate": round(hits / lookups, 3) if lookups else 0.0,
+            "memory_entries": len(self._memory),
+            "enabled": self.enabled,
+        }
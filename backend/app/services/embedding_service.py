@@ -0,0 +1,237 @@
+"""
+Sentence embedding service
+
+The model is loaded lazily on first use, so importing this module (API
+workers, the bot, scripts) doesn't pull in torch. EMBEDDING_BACKEND selects
+SentenceTransformer ("torch") or an int8 ONNX export of the same model
+("onnx", see export_onnx_embeddings.py).
+
+One process can own the model and serve the others over a Unix socket:
+
+    EMBEDDING_SERVICE_SOCKET=/tmp/embeddings.sock python -m app.services.embedding_service
+
+Processes with EMBEDDING_SERVICE_SOCKET set send their texts to that server
+and fall back to a local model if it is unreachable.
+
+Local encodes run on a small thread pool, never on the event loop.
+Requests that arrive within EMBEDDING_BATCH_WINDOW seconds of each other
+are merged into one model call.
+"""
+import asyncio
+import json
+import logging
+import os
+import struct
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional
+
+import numpy as np
+
+from app.config import settings
+from app.services.embedding_cache import EmbeddingCache
+
+logger = logging.getLogger(__name__)
+
+_FRAME_HEADER = struct.Struct(">I")
+
+
+async def _read_frame(reader: asyncio.StreamReader) -> bytes:
+    (length,) = _FRAME_HEADER.unpack(await reader.readexactly(_FRAME_HEADER.size))
+    return await reader.readexactly(length)
+
+
+def _write_frame(writer: asyncio.StreamWriter, payload: bytes):
+    writer.write(_FRAME_HEADER.pack(len(payload)) + payload)
+
+
+class EmbeddingService:
+    """Encodes texts into float32 embedding vectors"""
+
+    def __init__(
+        self,
+        model_name: str,
+        socket_path: Optional[str] = None,
+        remote_timeout: float = 30.0,
+        cache: Optional[EmbeddingCache] = None,
+        workers: int = 1,
+        batch_window: float = 0.01,
+        backend: str = "torch",
+        onnx_path: Optional[str] = None,
+    ):
+        self.model_name = model_name
+        self.backend = backend
+        self.onnx_path = onnx_path
+        self.socket_path = socket_path or None
+        self.remote_timeout = remote_timeout
+        self.cache = cache
+        self.batch_window = batch_window
+        self._model = None
+        self._model_lock = threading.Lock()
+        # torch releases the GIL while encoding, so threads keep the loop responsive
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="embedding")
+        self._pending: list = []
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+        self._batches: set = set()
+
+    def _get_model(self):
+        if self._model is None:
+            with self._model_lock:
+                if self._model is None and self.backend == "onnx":
+                    from app.services.onnx_embeddings import OnnxEmbeddingModel
+
+                    logger.info(f"Loading ONNX embedding model from {self.onnx_path}")
+                    self._model = OnnxEmbeddingModel(self.onnx_path)
+                elif self._model is None:
+                    from sentence_transformers import SentenceTransformer
+
+                    logger.info(f"Loading embedding model {self.model_name}")
+                    self._model = SentenceTransformer(self.model_name)
+        return self._model
+
+    def _encode_local(self, texts: List[str]) -> np.ndarray:
+        return np.asarray(self._get_model().encode(texts), dtype=np.float32)
+
+    async def encode_batch(self, texts: List[str]) -> np.ndarray:
+        """Encode texts into a (len(texts), dim) float32 matrix"""
+        if not texts:
+            return np.empty((0, 0), dtype=np.float32)
+        if not (self.cache and self.cache.enabled):
+            return await self._encode(texts)
+
+        keys = [self.cache.make_key(text) for text in texts]
+        vectors = await self.cache.get_many(keys)
+
+        # Encode each distinct uncached text once
+        missing = {key: text for key, text in zip(keys, texts, strict=True) if key not in vectors}
+        if missing:
+            encoded = await self._encode(list(missing.values()))
+            new_vectors = dict(zip(missing.keys(), encoded, strict=True))
+            await self.cache.set_many(new_vectors)
+            vectors.update(new_vectors)
+
+        return np.stack([vectors[key] for key in keys])
+
+    async def _encode(self, texts: List[str]) -> np.ndarray:
+        if self.socket_path:
+            try:
+                return await asyncio.wait_for(self._encode_remote(texts), self.remote_timeout)
+            except (OSError, asyncio.IncompleteReadError, asyncio.TimeoutError, RuntimeError) as e:
+                logger.warning(f"Embedding server at {self.socket_path} unavailable, encoding locally: {e}")
+
+        return await self._encode_pooled(texts)
+
+    async def _encode_pooled(self, texts: List[str]) -> np.ndarray:
+        """Queue texts for the next micro-batch and wait for their rows"""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((texts, future))
+        if self._flush_handle is None:
+            self._flush_handle = loop.call_later(self.batch_window, self._flush)
+        return await future
+
+    def _flush(self):
+        self._flush_handle = None
+        pending, self._pending = self._pending, []
+        task = asyncio.ensure_future(self._run_batch(pending))
+        self._batches.add(task)
+        task.add_done_callback(self._batches.discard)
+
+    async def _run_batch(self, pending: list):
+        texts = [text for batch_texts, _ in pending for text in batch_texts]
+        try:
+            embeddings = await asyncio.get_running_loop().run_in_executor(self._executor, self._encode_local, texts)
+        except Exception as e:
+            for _, future in pending:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        offset = 0
+        for batch_texts, future in pending:
+            if not future.done():  # caller may have been cancelled
+                future.set_result(embeddings[offset:offset + len(batch_texts)])
+            offset += len(batch_texts)
+
+    async def _encode_remote(self, texts: List[str]) -> np.ndarray:
+        reader, writer = await asyncio.open_unix_connection(self.socket_path)
+        try:
+            _write_frame(writer, json.dumps({"texts": texts}, ensure_ascii=False).encode("utf-8"))
+            await writer.drain()
+
+            header = json.loads(await _read_frame(reader))
+            if "error" in header:
+                raise RuntimeError(f"Embedding server error: {header['error']}")
+            data = await _read_frame(reader)
+            return np.frombuffer(data, dtype="<f4").reshape(header["shape"])
+        finally:
+            writer.close()
+            await writer.wait_closed()
+
+    async def serve(self, socket_path: str):
+        """Serve encode requests for other processes on a Unix socket"""
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+
+        await asyncio.get_running_loop().run_in_executor(self._executor, self._get_model)
+        server = await asyncio.start_unix_server(self._handle_client, path=socket_path)
+        logger.info(f"Embedding server listening on {socket_path}")
+        async with server:
+            await server.serve_forever()
+
+    async def _handle_client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                try:
+                    request = json.loads(await _read_frame(reader))
+                except asyncio.IncompleteReadError:
+                    break  # client closed the connection
+
+                try:
+                    embeddings = (await self._encode_pooled(request["texts"])).astype("<f4", copy=False)
+                except Exception as e:
+                    logger.error(f"Error encoding texts for embedding client: {e}")
+                    _write_frame(writer, json.dumps({"error": str(e)}).encode("utf-8"))
+                else:
+                    _write_frame(writer, json.dumps({"shape": list(embeddings.shape)}).encode("utf-8"))
+                    _write_frame(writer, embeddings.tobytes())
+                await writer.drain()
+        finally:
+            writer.close()
+
+
+# Quantized vectors differ slightly from torch ones, so they are cached separately
+_cache_model_name = (
+    f"{settings.EMBEDDING_MODEL}:onnx-int8" if settings.EMBEDDING_BACKEND == "onnx" else settings.EMBEDDING_MODEL
+)
+
+# Singleton instance
+embedding_service = EmbeddingService(
+    settings.EMBEDDING_MODEL,
+    settings.EMBEDDING_SERVICE_SOCKET,
+    remote_timeout=settings.EMBEDDING_SERVICE_TIMEOUT,
+    cache=EmbeddingCache(
+        _cache_model_name,
+        max_entries=settings.EMBEDDING_CACHE_MAX_ENTRIES,
+        enabled=settings.EMBEDDING_CACHE_ENABLED,
+    ),
+    workers=settings.EMBEDDING_WORKERS,
+    batch_window=settings.EMBEDDING_BATCH_WINDOW,
+    backend=settings.EMBEDDING_BACKEND,
+    onnx_path=settings.EMBEDDING_ONNX_PATH,
+)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    if not settings.EMBEDDING_SERVICE_SOCKET:
+        raise SystemExit("EMBEDDING_SERVICE_SOCKET is not set")
+    # Serve with a local model and no cache; clients check their own cache first
+    server = EmbeddingService(
+        settings.EMBEDDING_MODEL,
+        workers=settings.EMBEDDING_WORKERS,
+        batch_window=settings.EMBEDDING_BATCH_WINDOW,
+        backend=settings.EMBEDDING_BACKEND,
+        onnx_path=settings.EMBEDDING_ONNX_PATH,
+    )
+    asyncio.run(server.serve(settings.EMBEDDING_SERVICE_SOCKET))
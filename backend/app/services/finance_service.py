@@ -4,18 +4,50 @@ import io
 import json
 import logging
 from datetime import datetime, timedelta
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Literal, Optional
 
 import pandas as pd
+from pydantic import BaseModel
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 from sqlalchemy import delete
 
+from app.config import settings
 from app.models import FinancialTransaction, CashFlowPrediction
 from app.services.llm_service import llm_service
+from app.services.llm_resilience import LLMError
+from app.services.structured_output import StructuredOutputError
 
 logger = logging.getLogger(__name__)
 
+# LLM output schemas
+class AmountLogic(BaseModel):
+    type: Literal["single_column", "separate_columns"]
+    amount_column: Optional[str] = None
+    income_column: Optional[str] = None
+    expense_column: Optional[str] = None
+
+
+class CSVColumnMapping(BaseModel):
+    date_column: str
+    description_column: str
+    amount_logic: AmountLogic
+
+
+class ForecastRisk(BaseModel):
+    severity: Literal["High", "Medium"]
+    message: str
+
+
+class ForecastRecommendation(BaseModel):
+    message: str
+
+
+class ForecastInsights(BaseModel):
+    risks: List[ForecastRisk] = []
+    recommendations: List[ForecastRecommendation] = []
+
+
 class FinanceService:
 
     async def get_column_mapping_from_llm(self, headers: List[str], sample_rows: List[List[str]]) -> Dict:
@@ -44,12 +76,19 @@ class FinanceService:
         Respond ONLY with the JSON object.
         """
         
-        response_str = await llm_service._call_llm([{"role": "user", "content": prompt}])
         try:
-            return json.loads(response_str)
-        except json.JSONDecodeError:
-            logger.error(f"Failed to decode LLM mapping response: {response_str}")
-            raise ValueError("Could not determine CSV mapping from LLM.")
+            mapping = await llm_service.generate_structured(
+                [{"role": "user", "content": prompt}],
+                CSVColumnMapping,
+                cache_ttl=settings.LLM_CACHE_TTL_CSV_MAPPING,
+            )
+            return mapping.model_dump()
+        except StructuredOutputError as e:
+            logger.error(f"Failed to decode LLM mapping response: {e}")
+            raise ValueError("Could not determine CSV mapping from LLM.") from e
+        except LLMError as e:
+            logger.error(f"LLM unavailable for CSV mapping: {e}")
+            raise ValueError("Could not determine CSV mapping from LLM.") from e
 
     async def store_transactions_from_csv(self, db: AsyncSession, user_id: int, file_content: bytes, mapping: Dict):
         # Delete old transactions
@@ -154,10 +193,11 @@ class FinanceService:
         }}
         If no significant risks are found, return empty lists.
         """
-        insights_str = await llm_service._call_llm([{"role": "user", "content": prompt}])
         try:
-            insights = json.loads(insights_str)
-        except json.JSONDecodeError:
+            insights = (await llm_service.generate_structured(
+                [{"role": "user", "content": prompt}], ForecastInsights
+            )).model_dump()
+        except LLMError:
             insights = {"risks": [], "recommendations": [{"message": "Could not generate AI insights."}]}
 
         # 5. Save to DB
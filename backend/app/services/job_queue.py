@@ -0,0 +1,207 @@
+import logging
+import uuid
+from datetime import timedelta
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+from uuid import UUID
+
+from sqlalchemy import and_, delete, func, or_, select, text, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.models import ScanJob
+
+logger = logging.getLogger(__name__)
+
+# Must match the predicate of uq_scan_jobs_active_dedupe_key
+ACTIVE_DEDUPE_PREDICATE = text("status IN ('pending', 'running')")
+# Rows per INSERT, well under the asyncpg limit of 32767 bind parameters
+ENQUEUE_CHUNK_SIZE = 1000
+
+
+class JobQueue:
+    """
+    Durable job queue in the scan_jobs table
+
+    Producers enqueue jobs; workers (`python -m app.worker`) claim them with
+    FOR UPDATE SKIP LOCKED, so any number of worker processes can poll the
+    table without getting the same job. A claimed job is leased to its worker,
+    which renews the lease while the job runs; if the worker dies, the job is
+    claimable again once the lease expires. Failed jobs are retried with
+    exponential backoff up to max_attempts and then kept as 'dead'.
+    """
+
+    def __init__(self, lease_seconds: Optional[float] = None, max_attempts: Optional[int] = None):
+        self.lease_seconds = lease_seconds or settings.JOB_LEASE_SECONDS
+        self.max_attempts = max_attempts or settings.JOB_MAX_ATTEMPTS
+
+    async def enqueue(
+        self, db: AsyncSession, kind: str, payload: Dict[str, Any], dedupe_key: Optional[str] = None
+    ) -> bool:
+        """Add one job; returns False if an active job with the same dedupe_key exists"""
+        return await self.enqueue_many(db, [(kind, payload, dedupe_key)]) == 1
+
+    async def enqueue_many(self, db: AsyncSession, jobs: Iterable[Sequence[Any]]) -> int:
+        """
+        Add (kind, payload, dedupe_key) jobs, skipping keys that already have an active job
+
+        Returns:
+            Number of jobs actually enqueued
+        """
+        rows = [
+            {
+                "id": uuid.uuid4(),
+                "kind": kind,
+                "payload": payload,
+                "dedupe_key": dedupe_key,
+                "status": "pending",
+                "attempts": 0,
+                "max_attempts": self.max_attempts,
+            }
+            for kind, payload, dedupe_key in jobs
+        ]
+
+        enqueued = 0
+        for start in range(0, len(rows), ENQUEUE_CHUNK_SIZE):
+            stmt = (
+                insert(ScanJob)
+                .values(rows[start:start + ENQUEUE_CHUNK_SIZE])
+                .on_conflict_do_nothing(index_elements=["dedupe_key"], index_where=ACTIVE_DEDUPE_PREDICATE)
+                .returning(ScanJob.id)
+            )
+            enqueued += len((await db.execute(stmt)).all())
+        await db.commit()
+        return enqueued
+
+    async def claim(
+        self, db: AsyncSession, worker_id: str, limit: int = 1, kinds: Optional[List[str]] = None
+    ) -> List[ScanJob]:
+        """Lease up to `limit` runnable jobs: due pending jobs, and running ones whose lease expired"""
+        runnable = or_(
+            and_(ScanJob.status == "pending", ScanJob.run_after <= func.now()),
+            and_(
+                ScanJob.status == "running",
+                ScanJob.lease_expires_at < func.now(),
+                ScanJob.attempts < ScanJob.max_attempts,
+            ),
+        )
+        candidates = select(ScanJob.id).where(runnable)
+        if kinds:
+            candidates = candidates.where(ScanJob.kind.in_(kinds))
+        candidates = candidates.order_by(ScanJob.run_after).limit(limit).with_for_update(skip_locked=True)
+
+        stmt = (
+            update(ScanJob)
+            .where(ScanJob.id.in_(candidates))
+            .values(
+                status="running",
+                locked_by=worker_id,
+                lease_expires_at=func.now() + timedelta(seconds=self.lease_seconds),
+                attempts=ScanJob.attempts + 1,
+            )
+            .returning(ScanJob)
+            .execution_options(synchronize_session=False)
+        )
+        jobs = (await db.execute(stmt)).scalars().all()
+        await db.commit()
+        return list(jobs)
+
+    async def renew_lease(self, db: AsyncSession, job_id: UUID, worker_id: str) -> bool:
+        """Extend a running job's lease; False if the job is no longer leased to this worker"""
+        result = await db.execute(
+            update(ScanJob)
+            .where(ScanJob.id == job_id, ScanJob.locked_by == worker_id, ScanJob.status == "running")
+            .values(lease_expires_at=func.now() + timedelta(seconds=self.lease_seconds))
+        )
+        await db.commit()
+        return result.rowcount > 0
+
+    async def complete(self, db: AsyncSession, job_id: UUID, worker_id: str):
+        await db.execute(
+            update(ScanJob)
+            .where(ScanJob.id == job_id, ScanJob.locked_by == worker_id)
+            .values(status="done", finished_at=func.now(), lease_expires_at=None, last_error=None)
+        )
+        await db.commit()
+
+    async def fail(self, db: AsyncSession, job: ScanJob, worker_id: str, error: str):
+        """Schedule a retry with exponential backoff, or dead-letter the job after its last attempt"""
+        if job.attempts >= job.max_attempts:
+            values = {"status": "dead", "finished_at": func.now()}
+            logger.error(f"Job {job.kind} {job.id} dead-lettered after {job.attempts} attempts: {error}")
+        else:
+            delay = min(settings.JOB_RETRY_MAX_DELAY, settings.JOB_RETRY_BASE_DELAY * 2 ** (job.attempts - 1))
+            values = {"status": "pending", "run_after": func.now() + timedelta(seconds=delay)}
+
+        await db.execute(
+            update(ScanJob)
+            .where(ScanJob.id == job.id, ScanJob.locked_by == worker_id)
+            .values(**values, locked_by=None, lease_expires_at=None, last_error=error[:2000])
+        )
+        await db.commit()
+
+    async def defer(self, db: AsyncSession, job: ScanJob, worker_id: str, delay: float):
+        """Put a job that can't run yet back in the queue for `delay` seconds, without using up an attempt"""
+        await db.execute(
+            update(ScanJob)
+            .where(ScanJob.id == job.id, ScanJob.locked_by == worker_id)
+            .values(
+                status="pending",
+                run_after=func.now() + timedelta(seconds=delay),
+                attempts=ScanJob.attempts - 1,
+                locked_by=None,
+                lease_expires_at=None,
+            )
+        )
+        await db.commit()
+
+    async def dead_letter_expired(self, db: AsyncSession) -> int:
+        """Dead-letter running jobs whose lease expired on their last attempt (their worker died)"""
+        result = await db.execute(
+            update(ScanJob)
+            .where(
+                ScanJob.status == "running",
+                ScanJob.lease_expires_at < func.now(),
+                ScanJob.attempts >= ScanJob.max_attempts,
+            )
+            .values(status="dead", finished_at=func.now(), locked_by=None, last_error="Lease expired")
+        )
+        await db.commit()
+        if result.rowcount:
+            logger.error(f"Dead-lettered {result.rowcount} jobs whose worker stopped responding")
+        return result.rowcount
+
+    async def purge_finished(self, db: AsyncSession) -> int:
+        """Delete done jobs older than JOB_RETENTION_DAYS; dead jobs are kept for inspection"""
+        result = await db.execute(
+            delete(ScanJob).where(
+                ScanJob.status == "done",
+                ScanJob.finished_at < func.now() - timedelta(days=settings.JOB_RETENTION_DAYS),
+            )
+        )
+        await db.commit()
+        logger.info(f"Purged {result.rowcount} finished scan jobs")
+        return result.rowcount
+
+    async def get_stats(self, db: AsyncSession) -> Dict[str, Dict[str, int]]:
+        """Job counts by kind and status"""
+        result = await db.execute(
+            select(ScanJob.kind, ScanJob.status, func.count()).group_by(ScanJob.kind, ScanJob.status)
+        )
+        stats: Dict[str, Dict[str, int]] = {}
+        for kind, status, count in result.all():
+            stats.setdefault(kind, {})[status] = count
+        return stats
+
+    async def count_by_status(self, db: AsyncSession, dedupe_prefix: str) -> Dict[str, int]:
+        """Counts by status of the jobs whose dedupe_key starts with `dedupe_prefix`"""
+        result = await db.execute(
+            select(ScanJob.status, func.count())
+            .where(ScanJob.dedupe_key.startswith(dedupe_prefix, autoescape=True))
+            .group_by(ScanJob.status)
+        )
+        return dict(result.all())
+
+
+# Singleton instance
+job_queue = JobQueue()
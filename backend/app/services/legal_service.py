@@ -1,30 +1,87 @@
 import asyncio
+import hashlib
+import uuid
 import json
 import logging
 import numpy as np
 import feedparser
-from typing import List, Dict
+from typing import List, Dict, Literal, Optional
+from pydantic import BaseModel, model_validator
+from sqlalchemy import delete
+from sqlalchemy.dialects.postgresql import insert
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
-from sentence_transformers import SentenceTransformer
 
-from app.models import BusinessContext, LegalUpdate, ProcessedArticle, User, ComplianceAlert
+from app.config import settings
+from app.models import BusinessContext, LegalUpdate, ProcessedArticle, User, ComplianceAlert, LegalAnalysisCacheEntry
+from app.services.job_queue import job_queue
 from app.services.llm_service import llm_service
+from app.services.llm_resilience import LLMError
+from app.services.structured_output import StructuredOutputError
 from app.services.scraping_service import scraping_service
-from datetime import datetime, timedelta
+from app.services.embedding_service import embedding_service
+from app.services.similarity import top_k_matches
+from datetime import datetime, timedelta, timezone
 
 logger = logging.getLogger(__name__)
 
-# It's better to load the model once and reuse it.
-# Using a smaller, faster model for this task.
-embedding_model = SentenceTransformer('all-MiniLM-L6-v2')
-
 # Hardcoded list of sources for now. This should be in a config.
 LEGAL_NEWS_SOURCES = [
     "https://www.garant.ru/hotlaw/rss/",
     "https://www.consultant.ru/rss/hotdocs.xml"
 ]
 
+# Articles per user sent to the LLM, and the minimum cosine similarity
+TOP_K_ARTICLES = 5
+SIMILARITY_THRESHOLD = 0.3
+
+# Business context fields a legal verdict depends on; users with the same
+# normalized values share cached verdicts
+PROFILE_FIELDS = ("industry", "business_type", "legal_form", "location")
+
+
+def _context_profile(structured_data: Optional[Dict]) -> Dict[str, str]:
+    data = structured_data or {}
+    return {field: " ".join(str(data.get(field) or "").lower().split()) for field in PROFILE_FIELDS}
+
+
+def _sha256(value: str) -> str:
+    return hashlib.sha256(value.encode("utf-8")).hexdigest()
+
+
+def _profile_fingerprint(profile: Dict[str, str]) -> str:
+    return _sha256(json.dumps(profile, sort_keys=True, ensure_ascii=False))
+
+# LLM output schemas
+class StructuredBusinessContext(BaseModel):
+    industry: Optional[str] = None
+    business_type: Optional[str] = None
+    legal_form: Optional[str] = None
+    location: Optional[str] = None
+    keywords: List[str] = []
+
+
+class LegalArticleAnalysis(BaseModel):
+    relevant: bool
+    impact_level: Optional[Literal["High", "Medium", "Low"]] = None
+    category: Optional[str] = None
+    summary: Optional[str] = None
+
+    @model_validator(mode="after")
+    def check_relevant_fields(self):
+        if self.relevant and not (self.impact_level and self.category and self.summary):
+            raise ValueError("impact_level, category and summary are required when relevant is true")
+        return self
+
+
+class LegalBatchVerdict(LegalArticleAnalysis):
+    index: int
+
+
+class LegalBatchAnalysis(BaseModel):
+    verdicts: List[LegalBatchVerdict]
+
+
 class LegalService:
 
     async def get_business_context(self, db: AsyncSession, user_id: int) -> BusinessContext | None:
@@ -48,16 +105,21 @@ class LegalService:
 
         Description: "{description}"
         """
-        structured_data_str = await llm_service._call_llm([{"role": "user", "content": prompt}])
         try:
-            structured_data = json.loads(structured_data_str)
-        except json.JSONDecodeError:
-            logger.error("Failed to decode structured data from LLM")
+            structured = await llm_service.generate_structured(
+                [{"role": "user", "content": prompt}], StructuredBusinessContext
+            )
+            structured_data = structured.model_dump()
+        except StructuredOutputError as e:
+            logger.error(f"Failed to decode structured data from LLM: {e}")
+            return None
+        except LLMError as e:
+            logger.error(f"LLM unavailable while structuring business context: {e}")
             return None
 
         # 2. Generate embedding for the structured context
         context_string = ", ".join(f"{k}: {v}" for k, v in structured_data.items())
-        embedding = embedding_model.encode(context_string).tolist()
+        embedding = (await embedding_service.encode_batch([context_string]))[0]
 
         # 3. Save to DB
         context = await self.get_business_context(db, user_id)
@@ -67,40 +129,123 @@ class LegalService:
         
         context.raw_description = description
         context.structured_data = structured_data
-        context.embedding = [str(e) for e in embedding] # Storing as string array
+        context.embedding = embedding
         
         await db.commit()
         await db.refresh(context)
         return context
 
-    async def daily_scan_and_process(self, db: AsyncSession):
+    async def enqueue_daily_scan(self, db: AsyncSession) -> int:
+        """
+        Fetch and match new legal articles, and enqueue their analysis
+
+        The feeds are fetched and embedded once here. Each user with matching
+        articles gets a legal_scan_user job that analyzes and commits that
+        user's articles; a legal_scan_finalize job marks the articles processed
+        once all of them have finished.
+
+        Returns:
+            Number of per-user jobs enqueued
+        """
         logger.info("Starting daily legal scan...")
-        
+
+        # Articles of a batch still being analyzed aren't processed yet; don't fetch them again
+        active = await job_queue.count_by_status(db, "legal_scan_finalize:")
+        if active.get("pending") or active.get("running"):
+            logger.info("Previous legal scan still in progress, skipping.")
+            return 0
+
         # 1. Fetch new articles
         new_articles = await self._fetch_new_articles(db)
         if not new_articles:
             logger.info("No new legal articles found.")
-            return
+            return 0
 
         logger.info(f"Found {len(new_articles)} new articles to process.")
 
         # 2. Generate embeddings for new articles
         article_texts = [f"{a['title']} {a.get('summary', '')}" for a in new_articles]
-        article_embeddings = embedding_model.encode(article_texts)
+        article_embeddings = await embedding_service.encode_batch(article_texts)
 
         # 3. Get all users with business contexts
         users_with_context = (await db.execute(select(BusinessContext))).scalars().all()
-
-        # 4. Process for each user
+        dim = article_embeddings.shape[1]
+        contexts = []
         for context in users_with_context:
-            await self._process_articles_for_user(db, context, new_articles, article_embeddings)
-        
-        # 5. Mark articles as processed
-        for article in new_articles:
-            db.add(ProcessedArticle(url=article['url']))
+            if context.embedding is not None and len(context.embedding) == dim:
+                contexts.append(context)
+            else:
+                logger.warning(f"Business context for user {context.user_id} has no usable embedding. Skipping article processing.")
+
+        # 4. Match all users against all articles in one pass
+        user_matrix = np.stack([c.embedding for c in contexts]) if contexts else np.empty((0, dim), dtype=np.float32)
+        matches = top_k_matches(user_matrix, article_embeddings, TOP_K_ARTICLES, SIMILARITY_THRESHOLD)
+
+        # 5. One job per user with matches, plus the job that marks the articles processed
+        batch_id = uuid.uuid4().hex
+        jobs = [
+            (
+                "legal_scan_user",
+                {"batch_id": batch_id, "user_id": context.user_id, "articles": [new_articles[i] for i, _ in row]},
+                f"legal_scan_user:{batch_id}:{context.user_id}",
+            )
+            for context, row in zip(contexts, matches, strict=True)
+            if row
+        ]
+        jobs.append((
+            "legal_scan_finalize",
+            {"batch_id": batch_id, "urls": [a['url'] for a in new_articles]},
+            f"legal_scan_finalize:{batch_id}",
+        ))
+        await job_queue.enqueue_many(db, jobs)
+
+        logger.info(f"Enqueued legal analysis for {len(jobs) - 1} users (batch {batch_id}).")
+        return len(jobs) - 1
+
+    async def process_user_articles(self, db: AsyncSession, user_id: int, articles: List[Dict]) -> bool:
+        """
+        Analyze one user's matched articles and commit the relevant ones
+
+        Returns False if the LLM is unavailable; nothing is stored then, and
+        articles stored by an earlier attempt are skipped on the retry.
+        """
+        context = await self.get_business_context(db, user_id)
+        if context is None:
+            logger.info(f"User {user_id} no longer has a business context, skipping legal analysis.")
+            return True
+
+        verdicts = await self._load_cached_verdicts(db, articles)
+        try:
+            await self._process_articles_for_user(db, context, articles, verdicts)
+        except LLMError as e:
+            await db.rollback()
+            logger.error(f"LLM unavailable, aborting legal analysis for user {user_id}: {e}")
+            return False
+
         await db.commit()
-        
-        logger.info("Daily legal scan finished.")
+        return True
+
+    async def finish_daily_scan(self, db: AsyncSession, batch_id: str, urls: List[str]) -> bool:
+        """
+        Mark a scan's articles processed once all its per-user jobs finished
+
+        Returns False while some of them are still queued or running. If any
+        was dead-lettered the articles are left unprocessed, so the next scan
+        analyzes them again (users that already have them are skipped).
+        """
+        counts = await job_queue.count_by_status(db, f"legal_scan_user:{batch_id}:")
+        if counts.get("pending") or counts.get("running"):
+            return False
+
+        if counts.get("dead"):
+            logger.warning(f"{counts['dead']} legal analysis jobs of batch {batch_id} failed; leaving its articles for the next scan.")
+            return True
+
+        await db.execute(insert(ProcessedArticle).values([{"url": url} for url in urls]).on_conflict_do_nothing())
+        await db.commit()
+
+        logger.info(f"Daily legal scan finished (batch {batch_id}).")
+        return True
 
     async def _fetch_new_articles(self, db: AsyncSession) -> List[Dict]:
         """Fetch new articles from RSS feeds using feedparser"""
@@ -138,81 +283,186 @@ class LegalService:
         logger.info(f"Found {len(new_articles)} new articles after deduplication")
         return new_articles
 
-    async def _process_articles_for_user(self, db: AsyncSession, context: BusinessContext, articles: List[Dict], article_embeddings: np.ndarray):
-        # Skip if context has no embedding
-        if not context.embedding:
-            logger.warning(f"Business context for user {context.user_id} has no embedding. Skipping article processing.")
-            return
+    async def _load_cached_verdicts(self, db: AsyncSession, articles: List[Dict]) -> Dict[tuple, Dict]:
+        """Unexpired verdicts for these articles, keyed by (url_hash, context_fingerprint)"""
+        url_hashes = [_sha256(a['url']) for a in articles]
+        result = await db.execute(
+            select(LegalAnalysisCacheEntry).where(
+                LegalAnalysisCacheEntry.url_hash.in_(url_hashes),
+                LegalAnalysisCacheEntry.expires_at > datetime.now(timezone.utc),
+            )
+        )
+        return {(e.url_hash, e.context_fingerprint): e.verdict for e in result.scalars().all()}
 
-        user_embedding = np.array([float(e) for e in context.embedding])
-        
-        # Cosine similarity
-        similarities = util.cos_sim(user_embedding, article_embeddings)[0]
-        
-        # Get top K most similar articles
-        top_k = 5
-        top_indices = np.argsort(similarities)[-top_k:]
-
-        for i in top_indices:
-            if similarities[i] < 0.3: continue # Similarity threshold
-
-            article = articles[i]
-            
-            # Deep analysis with LLM
-            prompt = f"""
-            Business Context: {context.structured_data}
-            Legal Article: "{article['title']}"
-            Summary: "{article.get('summary', '')}"
-
-            Analyze if this article is relevant to the business.
-            If not, respond with {{"relevant": false}}.
-            If relevant, respond in this JSON format:
+    async def purge_expired_verdicts(self, db: AsyncSession) -> int:
+        result = await db.execute(
+            delete(LegalAnalysisCacheEntry).where(LegalAnalysisCacheEntry.expires_at <= datetime.now(timezone.utc))
+        )
+        await db.commit()
+        return result.rowcount or 0
+
+    async def _process_articles_for_user(self, db: AsyncSession, context: BusinessContext, candidates: List[Dict], verdicts: Dict[tuple, Dict]):
+        """Analyze the user's best-matching articles and store the relevant ones"""
+        profile = _context_profile(context.structured_data)
+        fingerprint = _profile_fingerprint(profile)
+
+        # Verdicts already produced for another user with the same profile
+        pending = []
+        for article in candidates:
+            analysis = verdicts.get((_sha256(article['url']), fingerprint))
+            if analysis is None:
+                pending.append(article)
+            elif analysis.get("relevant"):
+                await self._save_legal_update(db, context, article, analysis)
+
+        # Deep analysis with LLM, several articles per call
+        batch_size = max(1, settings.LEGAL_ANALYSIS_BATCH_SIZE)
+        expires_at = datetime.now(timezone.utc) + timedelta(seconds=settings.LLM_CACHE_TTL_LEGAL_ANALYSIS)
+        for start in range(0, len(pending), batch_size):
+            batch = pending[start:start + batch_size]
+            if len(batch) == 1:
+                analyses = [await self._analyze_article(profile, batch[0])]
+            else:
+                analyses = await self._analyze_article_batch(profile, batch)
+
+            for article, analysis in zip(batch, analyses, strict=True):
+                if analysis is None:
+                    continue
+                url_hash = _sha256(article['url'])
+                verdicts[(url_hash, fingerprint)] = analysis
+                await db.merge(LegalAnalysisCacheEntry(
+                    url_hash=url_hash,
+                    context_fingerprint=fingerprint,
+                    verdict=analysis,
+                    expires_at=expires_at,
+                ))
+                if analysis.get("relevant"):
+                    await self._save_legal_update(db, context, article, analysis)
+
+        if len(candidates) > len(pending):
+            logger.info(f"Reused {len(candidates) - len(pending)} cached legal verdicts for user {context.user_id}")
+
+    async def _analyze_article(self, profile: Dict[str, str], article: Dict) -> Optional[Dict]:
+        """Single-article relevance analysis; None if the LLM output is unusable"""
+        prompt = f"""
+        Business Context: {profile}
+        Legal Article: "{article['title']}"
+        Summary: "{article.get('summary', '')}"
+
+        Analyze if this article is relevant to the business.
+        If not, respond with {{"relevant": false}}.
+        If relevant, respond in this JSON format:
+        {{
+          "relevant": true,
+          "impact_level": "High" | "Medium" | "Low",
+          "category": "Tax" | "Labor Law" | "Licensing" | "Other",
+          "summary": "A concise summary of what the business owner needs to know."
+        }}
+        """
+
+        try:
+            result = await llm_service.generate_structured(
+                [{"role": "user", "content": prompt}],
+                LegalArticleAnalysis,
+                cache_ttl=settings.LLM_CACHE_TTL_LEGAL_ANALYSIS,
+            )
+            return result.model_dump()
+        except StructuredOutputError as e:
+            logger.error(f"Failed to process LLM response for legal scan: {e}")
+            return None
+
+    async def _analyze_article_batch(self, profile: Dict[str, str], batch: List[Dict]) -> List[Optional[Dict]]:
+        """
+        Analyze several articles in one LLM call
+
+        Articles the model skipped, or the whole batch if its output can't be
+        parsed, fall back to single-article calls.
+        """
+        articles_text = "\n".join(
+            f'[{index}] Legal Article: "{article["title"]}"\n    Summary: "{article.get("summary", "")}"'
+            for index, article in enumerate(batch)
+        )
+        prompt = f"""
+        Business Context: {profile}
+
+        Legal Articles:
+        {articles_text}
+
+        For EACH article, analyze if it is relevant to the business.
+        Respond in this JSON format, with one verdict per article index:
+        {{
+          "verdicts": [
+            {{"index": 0, "relevant": false}},
             {{
+              "index": 1,
               "relevant": true,
               "impact_level": "High" | "Medium" | "Low",
               "category": "Tax" | "Labor Law" | "Licensing" | "Other",
               "summary": "A concise summary of what the business owner needs to know."
             }}
-            """
-            
-            llm_response_str = await llm_service._call_llm([{"role": "user", "content": prompt}])
-            try:
-                analysis = json.loads(llm_response_str)
-                if analysis.get("relevant"):
-                    new_update = LegalUpdate(
-                        user_id=context.user_id,
-                        title=article['title'],
-                        url=article['url'],
-                        source=article['source'],
-                        summary=analysis['summary'],
-                        impact_level=analysis['impact_level'],
-                        category=analysis['category'],
-                        full_text_hash=str(hash(article.get('summary', ''))),
-                        details=analysis
-                    )
-                    db.add(new_update)
-                    await db.flush()  # Flush to get the new_update.id
-
-                    # Create compliance alert for high and medium impact updates
-                    if analysis['impact_level'] in ['High', 'Medium']:
-                        # Calculate due date based on impact level
-                        days_until_due = 7 if analysis['impact_level'] == 'High' else 14
-                        due_date = (datetime.now() + timedelta(days=days_until_due)).date()
-
-                        compliance_alert = ComplianceAlert(
-                            user_id=context.user_id,
-                            legal_update_id=new_update.id,
-                            status='pending',
-                            action_required=f"Review and comply with: {article['title']}",
-                            due_date=due_date
-                        )
-                        db.add(compliance_alert)
-                        logger.info(f"Created compliance alert for user {context.user_id}: {article['title']}")
-
-            except (json.JSONDecodeError, KeyError) as e:
-                logger.error(f"Failed to process LLM response for legal scan: {e}")
-        
-        await db.commit()
+          ]
+        }}
+        """
+
+        verdicts: Dict[int, Dict] = {}
+        try:
+            result = await llm_service.generate_structured(
+                [{"role": "user", "content": prompt}],
+                LegalBatchAnalysis,
+                cache_ttl=settings.LLM_CACHE_TTL_LEGAL_ANALYSIS,
+                max_tokens=300 * len(batch),
+            )
+            for verdict in result.verdicts:
+                if 0 <= verdict.index < len(batch):
+                    verdicts[verdict.index] = verdict.model_dump(exclude={"index"})
+        except StructuredOutputError as e:
+            logger.warning(f"Batched legal analysis failed, falling back to per-article calls: {e}")
+
+        analyses = []
+        for index, article in enumerate(batch):
+            if index not in verdicts:
+                verdicts[index] = await self._analyze_article(profile, article)
+            analyses.append(verdicts[index])
+        return analyses
+
+    async def _save_legal_update(self, db: AsyncSession, context: BusinessContext, article: Dict, analysis: Dict):
+        # Skip articles the user already has (e.g. stored by an earlier, interrupted scan)
+        update_id = (await db.execute(
+            insert(LegalUpdate)
+            .values(
+                id=uuid.uuid4(),
+                user_id=context.user_id,
+                title=article['title'],
+                url=article['url'],
+                source=article['source'],
+                summary=analysis['summary'],
+                impact_level=analysis['impact_level'],
+                category=analysis['category'],
+                full_text_hash=str(hash(article.get('summary', ''))),
+                details=analysis
+            )
+            .on_conflict_do_nothing(index_elements=["user_id", "url"])
+            .returning(LegalUpdate.id)
+        )).scalar()
+        if update_id is None:
+            logger.info(f"Legal update already stored for user {context.user_id}: {article['url']}")
+            return
+
+        # Create compliance alert for high and medium impact updates
+        if analysis['impact_level'] in ['High', 'Medium']:
+            # Calculate due date based on impact level
+            days_until_due = 7 if analysis['impact_level'] == 'High' else 14
+            due_date = (datetime.now() + timedelta(days=days_until_due)).date()
+
+            compliance_alert = ComplianceAlert(
+                user_id=context.user_id,
+                legal_update_id=update_id,
+                status='pending',
+                action_required=f"Review and comply with: {article['title']}",
+                due_date=due_date
+            )
+            db.add(compliance_alert)
+            logger.info(f"Created compliance alert for user {context.user_id}: {article['title']}")
 
     async def get_legal_updates(self, db: AsyncSession, user_id: int) -> List[LegalUpdate]:
         result = await db.execute(
@@ -225,6 +475,3 @@ class LegalService:
 
 
 legal_service = LegalService()
-
-# Need to import util from sentence_transformers
-from sentence_transformers import util
@@ -0,0 +1,163 @@
+import math
+import re
+import threading
+from collections import Counter
+from typing import Any, Callable, Dict, Hashable, Iterable, List, Optional, Tuple
+
+from app.services.lru_cache import LRUCache
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+# "15 000", "15,000" and "15.000" -> "15000" so amounts match however they were typed
+_DIGIT_GROUP_RE = re.compile(r"(?<=\d)[\s,. ](?=\d{3}\b)")
+# "2024", "2024г", "2024года": years, which are everywhere in chat and match too much
+_YEAR_RE = re.compile(r"(?:19|20)\d{2}(?:г|гг|год[а-я]*)?")
+
+
+def tokenize(text: str) -> List[str]:
+    text = _DIGIT_GROUP_RE.sub("", text.lower().replace("ё", "е"))
+    return _TOKEN_RE.findall(text)
+
+
+def is_exact_token(token: str) -> bool:
+    """INNs, amounts, SKUs: tokens that only make sense as exact matches"""
+    if len(token) < 4 or _YEAR_RE.fullmatch(token):
+        return False
+    digits = sum(ch.isdigit() for ch in token)
+    if digits == len(token):
+        return digits >= 5  # amounts and INNs; shorter numbers are too common
+    return digits > 0
+
+
+class BM25Index:
+    """In-memory Okapi BM25 index over one tenant's documents"""
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.documents: Dict[str, Tuple[str, Dict[str, Any]]] = {}
+        self._lengths: Dict[str, int] = {}
+        self._postings: Dict[str, Dict[str, int]] = {}
+        self._total_length = 0
+
+    def __len__(self) -> int:
+        return len(self.documents)
+
+    def add(self, doc_id: str, text: str, metadata: Optional[Dict[str, Any]] = None):
+        if doc_id in self.documents:
+            self.remove(doc_id)
+
+        terms = Counter(tokenize(text))
+        for term, tf in terms.items():
+            self._postings.setdefault(term, {})[doc_id] = tf
+        length = sum(terms.values())
+        self.documents[doc_id] = (text, metadata or {})
+        self._lengths[doc_id] = length
+        self._total_length += length
+
+    def remove(self, doc_id: str):
+        if doc_id not in self.documents:
+            return
+        text, _ = self.documents.pop(doc_id)
+        for term in set(tokenize(text)):
+            postings = self._postings.get(term)
+            if postings:
+                postings.pop(doc_id, None)
+                if not postings:
+                    del self._postings[term]
+        self._total_length -= self._lengths.pop(doc_id)
+
+    def search(self, query: str, k: int = 5, require: Iterable[str] = ()) -> List[Tuple[str, float]]:
+        """
+        Top-k (doc_id, score) by BM25
+
+        Args:
+            require: tokens every returned document must contain
+        """
+        if not self.documents:
+            return []
+
+        candidates: Optional[set] = None
+        for token in require:
+            docs = set(self._postings.get(token, {}))
+            candidates = docs if candidates is None else candidates & docs
+            if not candidates:
+                return []
+
+        n = len(self.documents)
+        avg_length = self._total_length / n or 1.0
+        scores: Dict[str, float] = {}
+        for term in set(tokenize(query)):
+            postings = self._postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(1 + (n - len(postings) + 0.5) / (len(postings) + 0.5))
+            for doc_id, tf in postings.items():
+                if candidates is not None and doc_id not in candidates:
+                    continue
+                norm = tf + self.k1 * (1 - self.b + self.b * self._lengths[doc_id] / avg_length)
+                scores[doc_id] = scores.get(doc_id, 0.0) + idf * tf * (self.k1 + 1) / norm
+
+        return sorted(scores.items(), key=lambda item: item[1], reverse=True)[:k]
+
+
+class LexicalIndex:
+    """
+    Per-tenant BM25 indexes, built on first use and kept in sync by the owner
+
+    `loader(key)` returns (doc_id, text, metadata) triples for a tenant and is
+    called once per key. Incremental add/remove calls for tenants that aren't
+    loaded are ignored since the loader will pick those documents up. Only the
+    most recently used `max_tenants` indexes are kept in memory.
+    """
+
+    def __init__(self, loader: Callable[[Hashable], Iterable[Tuple[str, str, Dict[str, Any]]]], max_tenants: int = 1000):
+        self._loader = loader
+        self._indexes = LRUCache(max_tenants)
+        self._lock = threading.Lock()
+
+    def _get(self, key: Hashable, load: bool) -> Optional[BM25Index]:
+        index = self._indexes.get(key)
+        if index is None and load:
+            index = BM25Index()
+            for doc_id, text, metadata in self._loader(key):
+                index.add(doc_id, text, metadata)
+            self._indexes.set(key, index)
+        return index
+
+    def search(self, key: Hashable, query: str, k: int = 5, require: Iterable[str] = ()) -> List[Dict[str, Any]]:
+        with self._lock:
+            index = self._get(key, load=True)
+            return [
+                {"id": doc_id, "content": index.documents[doc_id][0], "metadata": index.documents[doc_id][1], "score": score}
+                for doc_id, score in index.search(query, k, require)
+            ]
+
+    def add(self, key: Hashable, doc_id: str, text: str, metadata: Optional[Dict[str, Any]] = None):
+        with self._lock:
+            index = self._get(key, load=False)
+            if index is not None:
+                index.add(doc_id, text, metadata)
+
+    def remove(self, key: Hashable, doc_ids: Iterable[str]):
+        with self._lock:
+            index = self._get(key, load=False)
+            if index is not None:
+                for doc_id in doc_ids:
+                    index.remove(doc_id)
+
+    def drop(self, key: Optional[Hashable] = None):
+        """Forget one tenant's index, or all of them"""
+        with self._lock:
+            if key is None:
+                self._indexes.clear()
+            else:
+                self._indexes.delete(key)
+
+
+def reciprocal_rank_fusion(rankings: List[List[str]], k: int = 60) -> List[Tuple[str, float]]:
+    """Fuse ranked id lists: score = sum of 1 / (k + rank) over the lists an id appears in"""
+    scores: Dict[str, float] = {}
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking, start=1):
+            scores[doc_id] = scores.get(doc_id, 0.0) + 1.0 / (k + rank)
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)
@@ -0,0 +1,120 @@
+import hashlib
+import json
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Optional, Dict, Any
+
+from sqlalchemy import delete
+
+from app.database import AsyncSessionLocal
+from app.models import LLMCacheEntry
+from app.services.lru_cache import LRUCache
+
+logger = logging.getLogger(__name__)
+
+
+class LLMResponseCache:
+    """Content-addressed cache for LLM completions.
+
+    Two tiers: an in-process LRU for hot entries and the application database
+    for entries that should survive restarts and be shared between workers.
+    """
+
+    def __init__(self, max_entries: int = 512, enabled: bool = True):
+        self.enabled = enabled
+        self._memory = LRUCache(max_entries)
+        self._stats = {"memory_hits": 0, "db_hits": 0, "misses": 0, "stores": 0, "errors": 0}
+
+    @staticmethod
+    def make_key(
+        model: str,
+        messages: list,
+        temperature: float,
+        max_tokens: int,
+        response_format: Optional[Dict[str, Any]] = None,
+    ) -> str:
+        """Hash the request parameters that determine the completion"""
+        payload = json.dumps(
+            {
+                "model": model,
+                "messages": messages,
+                "temperature": temperature,
+                "max_tokens": max_tokens,
+                "response_format": response_format,
+            },
+            sort_keys=True,
+            ensure_ascii=False,
+            separators=(",", ":"),
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    async def get(self, key: str) -> Optional[str]:
+        """Look up a cached completion, promoting database hits into memory"""
+        value = self._memory.get(key)
+        if value is not None:
+            self._stats["memory_hits"] += 1
+            return value
+
+        try:
+            async with AsyncSessionLocal() as session:
+                entry = await session.get(LLMCacheEntry, key)
+
+            now = datetime.now(timezone.utc)
+            if entry and entry.expires_at > now:
+                self._memory.set(key, entry.response, ttl=(entry.expires_at - now).total_seconds())
+                self._stats["db_hits"] += 1
+                return entry.response
+        except Exception as e:
+            self._stats["errors"] += 1
+            logger.warning(f"LLM cache lookup failed: {e}")
+
+        self._stats["misses"] += 1
+        return None
+
+    async def set(self, key: str, model: str, response: str, ttl: int):
+        """Store a completion in both tiers"""
+        self._memory.set(key, response, ttl=ttl)
+        self._stats["stores"] += 1
+
+        try:
+            async with AsyncSessionLocal() as session:
+                await session.merge(LLMCacheEntry(
+                    key=key,
+                    model=model,
+                    response=response,
+                    expires_at=datetime.now(timezone.utc) + timedelta(seconds=ttl),
+                ))
+                await session.commit()
+        except Exception as e:
+            self._stats["errors"] += 1
+            logger.warning(f"LLM cache store failed: {e}")
+
+    async def delete(self, key: str):
+        """Evict an entry from both tiers (e.g. a completion that failed validation)"""
+        self._memory.delete(key)
+        try:
+            async with AsyncSessionLocal() as session:
+                await session.execute(delete(LLMCacheEntry).where(LLMCacheEntry.key == key))
+                await session.commit()
+        except Exception as e:
+            self._stats["errors"] += 1
+            logger.warning(f"LLM cache delete failed: {e}")
+
+    async def purge_expired(self) -> int:
+        """Delete expired rows from the persistent tier"""
+        async with AsyncSessionLocal() as session:
+            result = await session.execute(
+                delete(LLMCacheEntry).where(LLMCacheEntry.expires_at <= datetime.now(timezone.utc))
+            )
+            await session.commit()
+            return result.rowcount or 0
+
+    def get_stats(self) -> Dict[str, Any]:
+        hits = self._stats["memory_hits"] + self._stats["db_hits"]
+        lookups = hits + self._stats["misses"]
+        return {
+            **self._stats,
+            "hit_rate": round(hits / lookups, 3) if lookups else 0.0,
+            "memory_entries": len(self._memory),
+            "enabled": self.enabled,
+        }
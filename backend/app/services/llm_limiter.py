@@ -0,0 +1,182 @@
+import asyncio
+import heapq
+import itertools
+import time
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from enum import IntEnum
+from typing import Any, Dict, Optional
+
+
+class Priority(IntEnum):
+    """Scheduling class for LLM requests (lower value is served first)"""
+    INTERACTIVE = 0
+    NORMAL = 1
+    BACKGROUND = 2
+
+
+_current_priority: ContextVar[Priority] = ContextVar("llm_priority", default=Priority.NORMAL)
+
+
+@contextmanager
+def llm_priority(priority: Priority):
+    """Run the enclosed LLM calls under the given priority class"""
+    token = _current_priority.set(priority)
+    try:
+        yield
+    finally:
+        _current_priority.reset(token)
+
+
+def current_priority() -> Priority:
+    return _current_priority.get()
+
+
+class TokenBucket:
+    """Per-minute budget refilled continuously"""
+
+    def __init__(self, per_minute: int):
+        self.capacity = float(per_minute)
+        self.tokens = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def time_until(self, amount: float) -> float:
+        """Seconds until `amount` can be consumed (oversized requests wait for a full bucket)"""
+        self._refill()
+        missing = min(amount, self.capacity) - self.tokens
+        return missing / self.rate if missing > 0 else 0.0
+
+    def consume(self, amount: float):
+        self._refill()
+        self.tokens -= amount
+
+    def refund(self, amount: float):
+        self._refill()
+        self.tokens = min(self.capacity, self.tokens + amount)
+
+
+class LLMRateLimiter:
+    """Async admission control for the LLM gateway.
+
+    Enforces a maximum number of in-flight requests plus optional
+    requests/minute and tokens/minute budgets. Waiters are admitted strictly
+    by priority class, then FIFO, so interactive chat jumps ahead of queued
+    background scans. Running requests are never interrupted.
+    """
+
+    def __init__(self, max_in_flight: int, requests_per_minute: int = 0, tokens_per_minute: int = 0):
+        self.max_in_flight = max_in_flight
+        self._requests = TokenBucket(requests_per_minute) if requests_per_minute > 0 else None
+        self._tokens = TokenBucket(tokens_per_minute) if tokens_per_minute > 0 else None
+
+        self._queue: list = []
+        self._seq = itertools.count()
+        self._in_flight = 0
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._stats = {
+            p.name.lower(): {"granted": 0, "total_wait": 0.0, "max_wait": 0.0}
+            for p in Priority
+        }
+
+    @asynccontextmanager
+    async def acquire(self, estimated_tokens: int = 0, priority: Optional[Priority] = None):
+        """Hold one request slot for the duration of the block"""
+        await self._wait_for_slot(priority if priority is not None else current_priority(), estimated_tokens)
+        try:
+            yield
+        finally:
+            self._release()
+
+    async def _wait_for_slot(self, priority: Priority, estimated_tokens: int):
+        loop = asyncio.get_running_loop()
+        waiter = loop.create_future()
+        enqueued_at = time.monotonic()
+        heapq.heappush(self._queue, (priority, next(self._seq), waiter, estimated_tokens))
+        self._dispatch()
+
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            # Granted just before cancellation: give the slot back
+            if waiter.done() and not waiter.cancelled():
+                self._release()
+            raise
+
+        waited = time.monotonic() - enqueued_at
+        stats = self._stats[priority.name.lower()]
+        stats["granted"] += 1
+        stats["total_wait"] += waited
+        stats["max_wait"] = max(stats["max_wait"], waited)
+
+    def _dispatch(self):
+        while self._queue:
+            _priority, _, waiter, estimated_tokens = self._queue[0]
+            if waiter.done():  # cancelled while queued
+                heapq.heappop(self._queue)
+                continue
+            if self._in_flight >= self.max_in_flight:
+                return
+
+            delay = max(
+                self._requests.time_until(1) if self._requests else 0.0,
+                self._tokens.time_until(estimated_tokens) if self._tokens else 0.0,
+            )
+            if delay > 0:
+                self._schedule_dispatch(delay)
+                return
+
+            heapq.heappop(self._queue)
+            if self._requests:
+                self._requests.consume(1)
+            if self._tokens:
+                self._tokens.consume(estimated_tokens)
+            self._in_flight += 1
+            waiter.set_result(None)
+
+    def _schedule_dispatch(self, delay: float):
+        if self._timer and not self._timer.cancelled():
+            return
+        loop = asyncio.get_running_loop()
+
+        def fire():
+            self._timer = None
+            self._dispatch()
+
+        self._timer = loop.call_later(delay, fire)
+
+    def _release(self):
+        self._in_flight -= 1
+        self._dispatch()
+
+    def record_usage(self, estimated_tokens: int, actual_tokens: int):
+        """Reconcile the token budget with the usage reported by the API"""
+        if not self._tokens:
+            return
+        if actual_tokens > estimated_tokens:
+            self._tokens.consume(actual_tokens - estimated_tokens)
+        else:
+            self._tokens.refund(estimated_tokens - actual_tokens)
+
+    def get_stats(self) -> Dict[str, Any]:
+        waits = {
+            name: {
+                "granted": s["granted"],
+                "avg_wait": round(s["total_wait"] / s["granted"], 3) if s["granted"] else 0.0,
+                "max_wait": round(s["max_wait"], 3),
+            }
+            for name, s in self._stats.items()
+        }
+        return {
+            "queue_depth": sum(1 for _, _, waiter, _ in self._queue if not waiter.done()),
+            "in_flight": self._in_flight,
+            "max_in_flight": self.max_in_flight,
+            "requests_available": round(self._requests.tokens, 1) if self._requests else None,
+            "tokens_available": round(self._tokens.tokens) if self._tokens else None,
+            "wait_seconds": waits,
+        }
@@ -0,0 +1,103 @@
+import random
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Optional
+
+
+class LLMError(Exception):
+    """The LLM gateway could not produce a completion"""
+
+
+class LLMNotConfiguredError(LLMError):
+    """No LLM7_API_KEY is configured"""
+
+
+class LLMUnavailableError(LLMError):
+    """Upstream is failing: retries exhausted or the circuit breaker is open"""
+
+
+class LLMRejectedError(LLMError):
+    """Upstream rejected the request (4xx other than 429); retrying won't help"""
+
+
+class LLMDeadlineExceededError(LLMError):
+    """The caller's deadline expired before a completion was produced"""
+
+
+_deadline: ContextVar[Optional[float]] = ContextVar("llm_deadline", default=None)
+
+
+@contextmanager
+def llm_deadline(seconds: float):
+    """Bound every LLM call (including retries and queueing) in the block.
+
+    Nested deadlines can only shorten the enclosing one.
+    """
+    new_deadline = time.monotonic() + seconds
+    current = _deadline.get()
+    token = _deadline.set(min(current, new_deadline) if current is not None else new_deadline)
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def remaining_time() -> Optional[float]:
+    """Seconds left before the current deadline, or None if unbounded"""
+    deadline = _deadline.get()
+    if deadline is None:
+        return None
+    return deadline - time.monotonic()
+
+
+def backoff_delay(attempt: int, base: float, cap: float) -> float:
+    """Exponential backoff with full jitter for the given retry attempt (1-based)"""
+    return random.uniform(0, min(cap, base * (2 ** (attempt - 1))))
+
+
+class CircuitBreaker:
+    """Consecutive-failure circuit breaker for one upstream endpoint.
+
+    closed -> open after `failure_threshold` consecutive failures; open ->
+    half_open after `reset_timeout` seconds, letting a single probe through;
+    the probe's outcome closes or re-opens the circuit.
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 60.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self._probe_started_at: Optional[float] = None
+
+    def allow(self) -> bool:
+        if self.state == "closed":
+            return True
+        now = time.monotonic()
+        if self.state == "open" and now - self.opened_at >= self.reset_timeout:
+            self.state = "half_open"
+            self._probe_started_at = None
+        # A probe that never reported back (cancelled, deadline) is replaced after reset_timeout
+        if self.state == "half_open" and (
+            self._probe_started_at is None or now - self._probe_started_at >= self.reset_timeout
+        ):
+            self._probe_started_at = now
+            return True
+        return False
+
+    def record_success(self):
+        self.state = "closed"
+        self.failures = 0
+        self._probe_started_at = None
+
+    def record_failure(self):
+        self.failures += 1
+        if self.state == "half_open" or self.failures >= self.failure_threshold:
+            self.state = "open"
+            self.opened_at = time.monotonic()
+            self._probe_started_at = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {"state": self.state, "consecutive_failures": self.failures}
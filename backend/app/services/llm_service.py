@@ -1,8 +1,28 @@
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, AsyncIterator, List
+import asyncio
 import logging
+import openai
 from openai import AsyncOpenAI
 import httpx
 from app.config import settings
+from app.services.llm_cache import LLMResponseCache
+from app.services.single_flight import SingleFlight
+from app.services.llm_limiter import LLMRateLimiter, Priority, llm_priority
+from app.services.llm_resilience import (
+    CircuitBreaker,
+    LLMNotConfiguredError,
+    LLMRejectedError,
+    LLMUnavailableError,
+    LLMDeadlineExceededError,
+    backoff_delay,
+    remaining_time,
+)
+from app.services.structured_output import (
+    StructuredOutputError,
+    build_repair_messages,
+    parse_structured,
+)
+from pydantic import TypeAdapter
 
 logger = logging.getLogger(__name__)
 
@@ -16,16 +36,33 @@ class LLMService:
             self.client = AsyncOpenAI(
                 api_key=settings.LLM7_API_KEY,
                 base_url=settings.LLM7_BASE_URL,
+                max_retries=0,  # retries are handled by _request_completion
             )
         else:
             logger.warning("LLM7_API_KEY not set - LLM features will not work")
             self.client = None
 
+        self.cache = LLMResponseCache(
+            max_entries=settings.LLM_CACHE_MAX_ENTRIES,
+            enabled=settings.LLM_CACHE_ENABLED,
+        )
+        self.single_flight = SingleFlight()
+        self.limiter = LLMRateLimiter(
+            max_in_flight=settings.LLM_MAX_IN_FLIGHT,
+            requests_per_minute=settings.LLM_REQUESTS_PER_MINUTE,
+            tokens_per_minute=settings.LLM_TOKENS_PER_MINUTE,
+        )
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        # Turned off at runtime if the gateway rejects response_format
+        self._json_mode_supported = settings.LLM_JSON_MODE
+        self._structured_stats = {"parsed": 0, "repaired": 0, "failed": 0}
+
     async def process_with_context(
         self,
         message: str,
         business_context: Optional[Dict[str, Any]] = None,
         conversation_history: Optional[list] = None,
+        retrieved_context: Optional[str] = None,
     ) -> Dict[str, Any]:
         """
         Process a message with full business context
@@ -34,34 +71,19 @@ class LLMService:
             message: User's input message
             business_context: Business information and settings
             conversation_history: Previous messages in conversation
+            retrieved_context: Memory hits and recent items to add to the system prompt
 
         Returns:
             Dict with response and metadata
         """
         try:
-            # Build system prompt with business context
-            system_prompt = self._build_system_prompt(business_context)
-
-            # Build messages array
-            messages = [{"role": "system", "content": system_prompt}]
+            messages = self.build_messages(message, business_context, conversation_history, retrieved_context)
 
-            if conversation_history:
-                messages.extend(conversation_history)
+            # Get response from LLM (chat is served ahead of background jobs)
+            with llm_priority(Priority.INTERACTIVE):
+                response = await self._call_llm(messages)
 
-            messages.append({"role": "user", "content": message})
-
-            # Get response from LLM
-            response = await self._call_llm(messages)
-
-            # Determine if action requires approval
-            requires_approval = self._check_approval_needed(response, business_context)
-
-            return {
-                "response": response,
-                "requires_approval": requires_approval,
-                "confidence": 0.85,  # Could be enhanced with actual confidence scoring
-                "action_type": self._detect_action_type(response),
-            }
+            return self.build_result(response, business_context)
         except Exception as e:
             logger.error(f"Error processing message with context: {e}")
             return {
@@ -71,6 +93,80 @@ class LLMService:
                 "action_type": "error",
             }
 
+    async def stream_with_context(
+        self,
+        message: str,
+        business_context: Optional[Dict[str, Any]] = None,
+        conversation_history: Optional[list] = None,
+        retrieved_context: Optional[str] = None,
+    ) -> AsyncIterator[str]:
+        """
+        Stream a chat response as text deltas
+
+        Same prompt as process_with_context, but tokens are yielded as they
+        arrive. Callers assemble the full text and pass it to build_result.
+        Raises LLMError if the stream cannot be started.
+        """
+        if not self.client:
+            raise LLMNotConfiguredError("LLM service is not configured. Please set LLM7_API_KEY in your .env file.")
+
+        breaker = self._breaker_for(settings.LLM7_BASE_URL)
+        if not breaker.allow():
+            raise LLMUnavailableError(f"Circuit open for {settings.LLM7_BASE_URL}")
+
+        messages = self.build_messages(message, business_context, conversation_history, retrieved_context)
+        max_tokens = 1000
+
+        async with self.limiter.acquire(self._estimate_tokens(messages, max_tokens), Priority.INTERACTIVE):
+            try:
+                stream = await self.client.chat.completions.create(
+                    model=settings.LLM7_MODEL,
+                    messages=messages,
+                    max_tokens=max_tokens,
+                    temperature=0.7,
+                    stream=True,
+                    timeout=settings.LLM_REQUEST_TIMEOUT,
+                )
+            except (openai.APIConnectionError, openai.RateLimitError, openai.InternalServerError) as e:
+                breaker.record_failure()
+                raise LLMUnavailableError(f"LLM stream failed to start: {e}") from e
+            except openai.APIStatusError as e:
+                breaker.record_success()
+                raise LLMRejectedError(f"LLM request rejected: {e}") from e
+            breaker.record_success()
+
+            async for chunk in stream:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+
+    def build_result(self, response: str, business_context: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Wrap a chat response with approval and action metadata"""
+        return {
+            "response": response,
+            "requires_approval": self._check_approval_needed(response, business_context),
+            "confidence": 0.85,  # Could be enhanced with actual confidence scoring
+            "action_type": self._detect_action_type(response),
+        }
+
+    def build_messages(
+        self,
+        message: str,
+        business_context: Optional[Dict[str, Any]] = None,
+        conversation_history: Optional[list] = None,
+        retrieved_context: Optional[str] = None,
+    ) -> list:
+        """Build the chat messages array: system prompt, history, user message"""
+        system_prompt = self._build_system_prompt(business_context)
+        if retrieved_context:
+            system_prompt += f"\nRelevant Information (from memory and recent updates):\n{retrieved_context}\n"
+        messages = [{"role": "system", "content": system_prompt}]
+
+        if conversation_history:
+            messages.extend(conversation_history)
+
+        messages.append({"role": "user", "content": message})
+        return messages
+
     def _build_system_prompt(self, business_context: Optional[Dict[str, Any]] = None) -> str:
         """Build system prompt with business context"""
         base_prompt = """You are an autonomous AI business assistant for Russian SMB owners.
@@ -115,23 +211,232 @@ Decision Thresholds:
 - Require approval: ₽{require.get('amount_range', [10000, 50000])[0]:,} - ₽{require.get('amount_range', [10000, 50000])[1]:,}
 - Always escalate: Over ₽{escalate.get('min_amount', 50000):,}"""
 
-    async def _call_llm(self, messages: list) -> str:
-        """Call LLM7.io API with configured model"""
+    async def _call_llm(
+        self,
+        messages: list,
+        temperature: float = 0.7,
+        max_tokens: int = 1000,
+        cache_ttl: Optional[int] = None,
+        response_format: Optional[Dict[str, Any]] = None,
+    ) -> str:
+        """
+        Call LLM7.io API with configured model
+
+        Args:
+            messages: Chat messages to send
+            temperature: Sampling temperature
+            max_tokens: Completion token limit
+            cache_ttl: Seconds to cache the completion for; None disables caching
+            response_format: OpenAI response_format, e.g. {"type": "json_object"}
+
+        Raises:
+            LLMError: no completion could be produced (not configured, upstream
+                unavailable, request rejected or deadline exceeded)
+        """
+        if not self.client:
+            raise LLMNotConfiguredError("LLM service is not configured. Please set LLM7_API_KEY in your .env file.")
+
+        # Identical concurrent requests share one upstream call and one result
+        key = self.cache.make_key(settings.LLM7_MODEL, messages, temperature, max_tokens, response_format)
+        return await self.single_flight.do(
+            key, lambda: self._complete(key, messages, temperature, max_tokens, cache_ttl, response_format)
+        )
+
+    async def generate_structured(
+        self,
+        messages: list,
+        schema: Any,
+        cache_ttl: Optional[int] = None,
+        temperature: float = 0.3,
+        max_tokens: int = 1000,
+        json_mode: Optional[bool] = None,
+        allow_truncated: bool = True,
+    ) -> Any:
+        """
+        Get a completion parsed and validated against a Pydantic schema
+
+        Uses JSON mode when the schema is an object and the gateway supports
+        it, extracts JSON tolerantly (fences, prose, truncation) and, if
+        validation fails, makes a single repair round-trip.
+
+        Args:
+            messages: Chat messages to send
+            schema: Pydantic model or type accepted by TypeAdapter (e.g. List[Model])
+            cache_ttl: Seconds to cache the completion for; None disables caching
+            temperature: Sampling temperature
+            max_tokens: Completion token limit
+            json_mode: Force JSON mode on/off; by default on for object schemas
+            allow_truncated: Accept output cut off by max_tokens after closing it;
+                if False it's invalid and goes through the repair round-trip
+
+        Returns:
+            The validated value (model instance, list, ...)
+
+        Raises:
+            StructuredOutputError: output still invalid after the repair round-trip
+            LLMError: the completion itself failed
+        """
+        adapter = TypeAdapter(schema)
+        if json_mode is None:
+            json_mode = adapter.json_schema().get("type") == "object"
+        response_format = {"type": "json_object"} if json_mode and self._json_mode_supported else None
+
+        try:
+            raw = await self._call_llm(messages, temperature, max_tokens, cache_ttl, response_format)
+        except LLMRejectedError:
+            if not response_format:
+                raise
+            logger.warning("LLM gateway rejected response_format, disabling JSON mode")
+            self._json_mode_supported = False
+            response_format = None
+            raw = await self._call_llm(messages, temperature, max_tokens, cache_ttl)
+
         try:
-            if not self.client:
-                return "LLM service is not configured. Please set LLM7_API_KEY in your .env file."
-
-            response = await self.client.chat.completions.create(
-                model=settings.LLM7_MODEL,
-                messages=messages,
-                max_tokens=1000,
-                temperature=0.7,
+            result = parse_structured(raw, adapter, allow_truncated)
+            self._structured_stats["parsed"] += 1
+            return result
+        except ValueError as e:
+            first_error = e
+
+        logger.warning(f"Structured output invalid, attempting repair: {first_error}")
+        # Don't keep serving an unusable completion from cache
+        if cache_ttl:
+            await self.cache.delete(
+                self.cache.make_key(settings.LLM7_MODEL, messages, temperature, max_tokens, response_format)
             )
-            return response.choices[0].message.content
 
-        except Exception as e:
-            logger.error(f"Error calling LLM7.io API: {e}")
-            return f"Error calling LLM: {str(e)}. Please check your LLM7_API_KEY."
+        raw = await self._call_llm(
+            build_repair_messages(messages, raw, first_error), temperature, max_tokens, None, response_format
+        )
+        try:
+            result = parse_structured(raw, adapter, allow_truncated)
+            self._structured_stats["repaired"] += 1
+            return result
+        except ValueError as e:
+            self._structured_stats["failed"] += 1
+            raise StructuredOutputError(f"Invalid structured output after repair: {e}") from e
+
+    async def _complete(
+        self,
+        key: str,
+        messages: list,
+        temperature: float,
+        max_tokens: int,
+        cache_ttl: Optional[int],
+        response_format: Optional[Dict[str, Any]] = None,
+    ) -> str:
+        """Serve a completion from cache or the upstream API"""
+        use_cache = bool(cache_ttl) and self.cache.enabled
+        if use_cache:
+            cached = await self.cache.get(key)
+            if cached is not None:
+                return cached
+
+        content = await self._request_completion(messages, temperature, max_tokens, response_format)
+
+        if use_cache and content:
+            await self.cache.set(key, settings.LLM7_MODEL, content, cache_ttl)
+
+        return content
+
+    async def _request_completion(
+        self,
+        messages: list,
+        temperature: float,
+        max_tokens: int,
+        response_format: Optional[Dict[str, Any]] = None,
+    ) -> str:
+        """Upstream call with limiter admission, jittered retries, circuit breaker and deadline"""
+        breaker = self._breaker_for(settings.LLM7_BASE_URL)
+        estimated_tokens = self._estimate_tokens(messages, max_tokens)
+        attempt = 0
+
+        while True:
+            if not breaker.allow():
+                raise LLMUnavailableError(f"Circuit open for {settings.LLM7_BASE_URL}")
+
+            remaining = remaining_time()
+            if remaining is not None and remaining <= 0:
+                raise LLMDeadlineExceededError("Deadline exceeded before the LLM call")
+            request_timeout = settings.LLM_REQUEST_TIMEOUT if remaining is None else min(settings.LLM_REQUEST_TIMEOUT, remaining)
+
+            try:
+                # The deadline covers both queueing in the limiter and the request itself
+                async with asyncio.timeout(remaining):
+                    async with self.limiter.acquire(estimated_tokens):
+                        response = await self.client.chat.completions.create(
+                            model=settings.LLM7_MODEL,
+                            messages=messages,
+                            max_tokens=max_tokens,
+                            temperature=temperature,
+                            timeout=request_timeout,
+                            **({"response_format": response_format} if response_format else {}),
+                        )
+            except (openai.APIConnectionError, openai.RateLimitError, openai.InternalServerError) as e:
+                breaker.record_failure()
+                attempt += 1
+                if attempt > settings.LLM_MAX_RETRIES:
+                    raise LLMUnavailableError(f"LLM request failed after {attempt} attempts: {e}") from e
+
+                delay = max(
+                    backoff_delay(attempt, settings.LLM_RETRY_BASE_DELAY, settings.LLM_RETRY_MAX_DELAY),
+                    min(self._retry_after(e), settings.LLM_RETRY_MAX_DELAY),
+                )
+                remaining = remaining_time()
+                if remaining is not None and delay >= remaining:
+                    raise LLMDeadlineExceededError(f"No time left to retry LLM request: {e}") from e
+
+                logger.warning(
+                    f"LLM request failed ({e.__class__.__name__}), retrying in {delay:.1f}s "
+                    f"(attempt {attempt}/{settings.LLM_MAX_RETRIES})"
+                )
+                await asyncio.sleep(delay)
+                continue
+            except openai.APIStatusError as e:
+                # Client errors (bad request, auth) will not succeed on retry; the endpoint itself is up
+                breaker.record_success()
+                raise LLMRejectedError(f"LLM request rejected: {e}") from e
+            except TimeoutError as e:
+                raise LLMDeadlineExceededError("Deadline exceeded while waiting for the LLM") from e
+
+            breaker.record_success()
+            if response.usage:
+                self.limiter.record_usage(estimated_tokens, response.usage.total_tokens)
+            return response.choices[0].message.content or ""
+
+    def _breaker_for(self, endpoint: str) -> CircuitBreaker:
+        if endpoint not in self._breakers:
+            self._breakers[endpoint] = CircuitBreaker(
+                failure_threshold=settings.LLM_CIRCUIT_FAILURE_THRESHOLD,
+                reset_timeout=settings.LLM_CIRCUIT_RESET_TIMEOUT,
+            )
+        return self._breakers[endpoint]
+
+    def _retry_after(self, error: Exception) -> float:
+        """Seconds requested by a Retry-After header, if any"""
+        response = getattr(error, "response", None)
+        if response is None:
+            return 0.0
+        try:
+            return float(response.headers.get("retry-after", 0))
+        except (TypeError, ValueError):
+            return 0.0
+
+    def _estimate_tokens(self, messages: list, max_tokens: int) -> int:
+        """Rough prompt + completion token estimate for the rate limiter"""
+        prompt_chars = sum(len(str(m.get("content", ""))) for m in messages)
+        # Cyrillic text averages ~3 characters per token
+        return prompt_chars // 3 + max_tokens
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Gateway metrics for monitoring"""
+        return {
+            "cache": self.cache.get_stats(),
+            "single_flight": self.single_flight.get_stats(),
+            "limiter": self.limiter.get_stats(),
+            "circuit_breakers": {endpoint: b.get_stats() for endpoint, b in self._breakers.items()},
+            "structured_output": {**self._structured_stats, "json_mode": self._json_mode_supported},
+        }
 
     def _check_approval_needed(self, response: str, business_context: Optional[Dict[str, Any]] = None) -> bool:
         """Determine if the action requires user approval"""
@@ -209,6 +514,30 @@ Keep it brief and actionable."""
                 "metrics": {},
             }
 
+    async def summarize_conversation(self, turns: List[str]) -> str:
+        """
+        Condense old chat turns into one digest for long-term memory
+
+        Raises:
+            LLMError: the digest couldn't be generated (callers keep the turns)
+        """
+        transcript = "\n\n".join(turns)
+        messages = [
+            {
+                "role": "system",
+                "content": "You compress a business owner's chat history with their assistant into long-term memory notes in Russian.",
+            },
+            {
+                "role": "user",
+                "content": f"""Summarize these conversation turns into a compact digest.
+Keep facts that matter later: decisions, preferences, numbers, names, product names, INN, amounts and dates.
+Drop greetings and small talk. Respond with the digest text only.
+
+{transcript}""",
+            },
+        ]
+        return await self._call_llm(messages, temperature=0.3, max_tokens=600)
+
     def _format_actions(self, actions: list) -> str:
         """Format actions for prompt"""
         if not actions:
@@ -1,17 +1,81 @@
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, NamedTuple, Optional
+import asyncio
 import logging
+import queue
+import re
+import threading
+import time
 import chromadb
 from chromadb.config import Settings as ChromaSettings
-from datetime import datetime
+from chromadb.errors import ChromaError, InvalidCollectionException
+from datetime import datetime, timedelta
 from app.config import settings
+from app.services.llm_resilience import LLMError
+from app.services.llm_service import llm_service
+from app.services.lexical_index import LexicalIndex, is_exact_token, reciprocal_rank_fusion, tokenize
 
 logger = logging.getLogger(__name__)
 
 
+class MemoryWrite(NamedTuple):
+    kind: str
+    user_id: int
+    doc_id: str
+    document: str
+    metadata: Dict[str, Any]
+
+
+# Writer thread control markers
+_FLUSH = object()
+_STOP = object()
+
+# Memory kinds; each user gets one collection per kind
+MEMORY_KINDS = ("conversations", "patterns", "decisions")
+MIGRATION_PAGE_SIZE = 500
+
+
+def tenant_collection_name(kind: str, user_id: int) -> str:
+    return f"{kind}_u{user_id}"
+
+
+def _collection_name(collection) -> str:
+    # list_collections returns names in newer chromadb versions, objects in older ones
+    return collection if isinstance(collection, str) else collection.name
+
+
+def _document_time(metadata: Optional[Dict[str, Any]]) -> datetime:
+    try:
+        return datetime.fromisoformat((metadata or {})["timestamp"])
+    except (KeyError, TypeError, ValueError):
+        return datetime.now()  # unknown age: never expire it
+
+
 class MemoryService:
-    """Vector-based memory service for pattern recognition and context retrieval"""
+    """Vector-based memory service for pattern recognition and context retrieval
+
+    Memory is partitioned per tenant: every user has their own
+    `{kind}_u{user_id}` collections, so queries only search that user's
+    documents and deleting a user's memory is a collection drop.
+
+    Writes are write-behind: store_* methods enqueue documents and a worker
+    thread embeds and adds them to ChromaDB in batches, so request latency
+    doesn't include embedding and disk writes. Recently stored documents
+    become searchable after the next flush (at most MEMORY_WRITE_FLUSH_INTERVAL).
+    """
 
     def __init__(self):
+        self.batch_size = settings.MEMORY_WRITE_BATCH_SIZE
+        self.flush_interval = settings.MEMORY_WRITE_FLUSH_INTERVAL
+        self.block_timeout = settings.MEMORY_WRITE_BLOCK_TIMEOUT
+        self._write_queue: queue.Queue = queue.Queue(maxsize=settings.MEMORY_WRITE_QUEUE_SIZE)
+        self._writer: Optional[threading.Thread] = None
+        self._write_stats = {"enqueued": 0, "written": 0, "failed": 0, "dropped": 0, "batches": 0}
+        self._collections: Dict[str, Any] = {}
+        self._retention_stats = {"runs": 0, "digests": 0, "compacted": 0, "expired": 0, "trimmed": 0}
+        self._collections_lock = threading.Lock()
+        # BM25 indexes over the same documents, for hybrid and exact-match search
+        self.lexical = LexicalIndex(self._load_lexical_documents, max_tenants=settings.MEMORY_LEXICAL_MAX_TENANTS)
+
         try:
             # Initialize ChromaDB client
             self.client = chromadb.PersistentClient(
@@ -22,10 +86,9 @@ class MemoryService:
                 )
             )
 
-            # Get or create collections
-            self.conversations = self._get_or_create_collection("conversations")
-            self.patterns = self._get_or_create_collection("patterns")
-            self.decisions = self._get_or_create_collection("decisions")
+            # The writer thread first moves documents out of the old shared collections
+            self._writer = threading.Thread(target=self._writer_loop, name="memory-writer", daemon=True)
+            self._writer.start()
 
             logger.info("Memory service initialized successfully")
         except Exception as e:
@@ -43,6 +106,83 @@ class MemoryService:
             logger.error(f"Error creating collection {name}: {e}")
             return None
 
+    def _get_collection(self, kind: str, user_id: int, create: bool = False):
+        """Route to a user's collection of the given kind (None if it doesn't exist)"""
+        if not self.client:
+            return None
+
+        name = tenant_collection_name(kind, user_id)
+        with self._collections_lock:
+            collection = self._collections.get(name)
+            if collection is not None:
+                return collection
+
+            if create:
+                collection = self._get_or_create_collection(name)
+            else:
+                try:
+                    collection = self.client.get_collection(name)
+                except Exception:
+                    return None  # user has no documents of this kind yet
+
+            if collection is not None:
+                self._collections[name] = collection
+            return collection
+
+    def _load_lexical_documents(self, key: tuple):
+        kind, user_id = key
+        collection = self._get_collection(kind, user_id)
+        if not collection:
+            return []
+        data = collection.get(include=["documents", "metadatas"])
+        return zip(data["ids"], data["documents"], data["metadatas"], strict=True)
+
+    def _migrate_shared_collections(self):
+        """Move documents from the pre-partitioning shared collections into per-user ones
+
+        Embeddings are copied as-is and upserted, so an interrupted migration
+        can simply run again on the next start.
+        """
+        for kind in MEMORY_KINDS:
+            try:
+                shared = self.client.get_collection(kind)
+            except InvalidCollectionException:
+                continue  # already migrated
+
+            logger.info(f"Migrating shared memory collection {kind} to per-user collections")
+            moved = 0
+            offset = 0
+            while True:
+                page = shared.get(
+                    include=["documents", "metadatas", "embeddings"],
+                    limit=MIGRATION_PAGE_SIZE,
+                    offset=offset,
+                )
+                if not page["ids"]:
+                    break
+                offset += len(page["ids"])
+
+                by_user: Dict[str, list] = {}
+                for i, doc_id in enumerate(page["ids"]):
+                    user_id = (page["metadatas"][i] or {}).get("user_id")
+                    if user_id is None:
+                        logger.warning(f"Skipping memory document {doc_id} without user_id")
+                        continue
+                    by_user.setdefault(str(user_id), []).append(i)
+
+                for user_id, indices in by_user.items():
+                    collection = self._get_collection(kind, int(user_id), create=True)
+                    collection.upsert(
+                        ids=[page["ids"][i] for i in indices],
+                        documents=[page["documents"][i] for i in indices],
+                        metadatas=[page["metadatas"][i] for i in indices],
+                        embeddings=[page["embeddings"][i] for i in indices],
+                    )
+                    moved += len(indices)
+
+            self.client.delete_collection(kind)
+            logger.info(f"Migrated {moved} documents out of shared collection {kind}")
+
     async def store_conversation(
         self,
         user_id: int,
@@ -52,22 +192,24 @@ class MemoryService:
     ) -> bool:
         """Store a conversation in vector database"""
         try:
-            if not self.conversations:
+            if not self.client:
                 return False
 
-            doc_id = f"conv_{user_id}_{datetime.now().timestamp()}"
+            now = datetime.now()
+            doc_id = f"conv_{user_id}_{now.timestamp()}"
 
-            self.conversations.add(
-                documents=[f"User: {user_message}\nAssistant: {ai_response}"],
-                metadatas=[{
+            return await self._enqueue(MemoryWrite(
+                kind="conversations",
+                user_id=user_id,
+                doc_id=doc_id,
+                document=f"User: {user_message}\nAssistant: {ai_response}",
+                metadata={
                     "user_id": str(user_id),
-                    "timestamp": datetime.now().isoformat(),
+                    "timestamp": now.isoformat(),
+                    "ts": now.timestamp(),  # numeric copy for range filters
                     "context": str(context or {}),
-                }],
-                ids=[doc_id]
-            )
-
-            return True
+                },
+            ))
         except Exception as e:
             logger.error(f"Error storing conversation: {e}")
             return False
@@ -80,13 +222,15 @@ class MemoryService:
     ) -> List[Dict[str, Any]]:
         """Retrieve relevant past conversations"""
         try:
-            if not self.conversations:
+            conversations = self._get_collection("conversations", user_id)
+            if not conversations:
                 return []
 
-            results = self.conversations.query(
+            # query() embeds the text with the model, keep it off the event loop
+            results = await asyncio.to_thread(
+                conversations.query,
                 query_texts=[query],
                 n_results=n_results,
-                where={"user_id": str(user_id)},
             )
 
             if not results["documents"]:
@@ -95,6 +239,7 @@ class MemoryService:
             context_items = []
             for i, doc in enumerate(results["documents"][0]):
                 context_items.append({
+                    "id": results["ids"][0][i],
                     "content": doc,
                     "metadata": results["metadatas"][0][i],
                     "relevance": 1.0 - (results["distances"][0][i] if "distances" in results else 0.5),
@@ -105,6 +250,85 @@ class MemoryService:
             logger.error(f"Error retrieving context: {e}")
             return []
 
+    async def get_recent_conversations(self, user_id: int, limit: int = 10) -> List[Dict[str, Any]]:
+        """Most recent conversation turns (oldest first), including ones not yet flushed"""
+        try:
+            turns = []
+            stored_ids = set()
+            conversations = self._get_collection("conversations", user_id)
+            if conversations:
+                since = (datetime.now() - timedelta(days=settings.MEMORY_RECENT_WINDOW_DAYS)).timestamp()
+                data = await asyncio.to_thread(
+                    conversations.get, where={"ts": {"$gte": since}}, include=["documents", "metadatas"]
+                )
+                if len(data["ids"]) < limit:
+                    # Quiet user, or turns stored before "ts" was recorded: read the whole collection
+                    data = await asyncio.to_thread(conversations.get, include=["documents", "metadatas"])
+                stored_ids.update(data["ids"])
+                turns.extend(
+                    {"content": doc, "metadata": meta or {}}
+                    for doc, meta in zip(data["documents"], data["metadatas"], strict=True)
+                    if (meta or {}).get("type") != "digest"
+                )
+
+            # Queued writes are read after the collection, and skipped by id if already stored,
+            # so a turn the writer flushes in between isn't returned twice
+            with self._write_queue.mutex:
+                queued = list(self._write_queue.queue)
+            turns.extend(
+                {"content": w.document, "metadata": w.metadata}
+                for w in queued
+                if isinstance(w, MemoryWrite) and w.kind == "conversations" and w.user_id == user_id
+                and w.doc_id not in stored_ids
+            )
+
+            turns.sort(key=lambda turn: _document_time(turn["metadata"]))
+            return turns[-limit:] if limit else []
+        except ChromaError as e:
+            logger.error(f"Error getting recent conversations: {e}")
+            return []
+
+    async def hybrid_search(
+        self,
+        user_id: int,
+        query: str,
+        n_results: int = 5,
+    ) -> List[Dict[str, Any]]:
+        """
+        Search past conversations lexically (BM25) and semantically, fused by reciprocal rank
+
+        Queries with exact tokens (INN, amounts, SKUs) are answered from the
+        lexical index alone when it has documents containing all of them,
+        without an embedding call.
+        """
+        try:
+            if not self.client:
+                return []
+
+            key = ("conversations", user_id)
+            exact_tokens = [token for token in tokenize(query) if is_exact_token(token)]
+            if exact_tokens:
+                hits = await asyncio.to_thread(self.lexical.search, key, query, n_results, exact_tokens)
+                if hits:
+                    return [
+                        {"id": h["id"], "content": h["content"], "metadata": h["metadata"], "relevance": h["score"]}
+                        for h in hits
+                    ]
+
+            lexical_hits = await asyncio.to_thread(self.lexical.search, key, query, n_results * 2)
+            vector_hits = await self.retrieve_relevant_context(user_id, query, n_results * 2)
+
+            by_id = {h["id"]: h for h in lexical_hits}
+            by_id.update((h["id"], h) for h in vector_hits)
+            fused = reciprocal_rank_fusion([[h["id"] for h in lexical_hits], [h["id"] for h in vector_hits]])
+            return [
+                {"id": doc_id, "content": by_id[doc_id]["content"], "metadata": by_id[doc_id]["metadata"], "relevance": score}
+                for doc_id, score in fused[:n_results]
+            ]
+        except Exception as e:
+            logger.error(f"Error in hybrid memory search: {e}")
+            return []
+
     async def store_pattern(
         self,
         user_id: int,
@@ -115,27 +339,27 @@ class MemoryService:
     ) -> bool:
         """Store a recognized pattern"""
         try:
-            if not self.patterns:
+            if not self.client:
                 return False
 
             doc_id = f"pattern_{user_id}_{pattern_type}_{datetime.now().timestamp()}"
 
             pattern_text = f"Pattern: {pattern_type}\nTrigger: {trigger}\nAction: {action}"
 
-            self.patterns.add(
-                documents=[pattern_text],
-                metadatas=[{
+            return await self._enqueue(MemoryWrite(
+                kind="patterns",
+                user_id=user_id,
+                doc_id=doc_id,
+                document=pattern_text,
+                metadata={
                     "user_id": str(user_id),
                     "pattern_type": pattern_type,
                     "trigger": str(trigger),
                     "action": action,
                     "success": success,
                     "timestamp": datetime.now().isoformat(),
-                }],
-                ids=[doc_id]
-            )
-
-            return True
+                },
+            ))
         except Exception as e:
             logger.error(f"Error storing pattern: {e}")
             return False
@@ -148,13 +372,15 @@ class MemoryService:
     ) -> List[Dict[str, Any]]:
         """Find similar patterns from history"""
         try:
-            if not self.patterns:
+            patterns_collection = self._get_collection("patterns", user_id)
+            if not patterns_collection:
                 return []
 
-            results = self.patterns.query(
+            results = await asyncio.to_thread(
+                patterns_collection.query,
                 query_texts=[current_situation],
                 n_results=n_results,
-                where={"user_id": str(user_id), "success": True},
+                where={"success": True},
             )
 
             if not results["documents"]:
@@ -183,7 +409,7 @@ class MemoryService:
     ) -> bool:
         """Store a decision for learning"""
         try:
-            if not self.decisions:
+            if not self.client:
                 return False
 
             doc_id = f"decision_{user_id}_{datetime.now().timestamp()}"
@@ -193,20 +419,20 @@ Context: {context}
 Action: {action_taken}
 Outcome: {outcome}"""
 
-            self.decisions.add(
-                documents=[decision_text],
-                metadatas=[{
+            return await self._enqueue(MemoryWrite(
+                kind="decisions",
+                user_id=user_id,
+                doc_id=doc_id,
+                document=decision_text,
+                metadata={
                     "user_id": str(user_id),
                     "decision_type": decision_type,
                     "context": str(context),
                     "action": action_taken,
                     "outcome": outcome,
                     "timestamp": datetime.now().isoformat(),
-                }],
-                ids=[doc_id]
-            )
-
-            return True
+                },
+            ))
         except Exception as e:
             logger.error(f"Error storing decision: {e}")
             return False
@@ -219,13 +445,15 @@ Outcome: {outcome}"""
     ) -> Dict[str, Any]:
         """Get insights from past decisions"""
         try:
-            if not self.decisions:
+            decisions = self._get_collection("decisions", user_id)
+            if not decisions:
                 return {"success_rate": 0.5, "total_decisions": 0, "recommendations": []}
 
-            results = self.decisions.query(
+            results = await asyncio.to_thread(
+                decisions.query,
                 query_texts=[decision_type],
                 n_results=n_results,
-                where={"user_id": str(user_id), "decision_type": decision_type},
+                where={"decision_type": decision_type},
             )
 
             if not results["documents"]:
@@ -250,20 +478,269 @@ Outcome: {outcome}"""
             logger.error(f"Error getting decision insights: {e}")
             return {"success_rate": 0.5, "total_decisions": 0, "recommendations": []}
 
+    async def _enqueue(self, write: MemoryWrite) -> bool:
+        """
+        Queue a document for the writer thread
+
+        When the queue is full the caller waits (off the event loop) up to
+        MEMORY_WRITE_BLOCK_TIMEOUT seconds for space, then the write is dropped.
+        """
+        try:
+            self._write_queue.put_nowait(write)
+        except queue.Full:
+            try:
+                await asyncio.to_thread(self._write_queue.put, write, True, self.block_timeout)
+            except queue.Full:
+                self._write_stats["dropped"] += 1
+                logger.warning(f"Memory write queue full, dropping {write.doc_id}")
+                return False
+
+        self._write_stats["enqueued"] += 1
+        return True
+
+    def _writer_loop(self):
+        """Collect queued writes into batches and add them to ChromaDB"""
+        try:
+            self._migrate_shared_collections()
+        except Exception as e:
+            logger.error(f"Error migrating shared memory collections: {e}")
+
+        while True:
+            item = self._write_queue.get()
+            gets = 1
+            batch: List[MemoryWrite] = []
+            deadline = time.monotonic() + self.flush_interval
+
+            while item is not _FLUSH and item is not _STOP:
+                batch.append(item)
+                remaining = deadline - time.monotonic()
+                if len(batch) >= self.batch_size or remaining <= 0:
+                    break
+                try:
+                    item = self._write_queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                gets += 1
+
+            if batch:
+                self._write_batch(batch)
+            for _ in range(gets):
+                self._write_queue.task_done()
+            if item is _STOP:
+                return
+
+    def _write_batch(self, batch: List[MemoryWrite]):
+        by_collection: Dict[tuple, List[MemoryWrite]] = {}
+        for write in batch:
+            by_collection.setdefault((write.kind, write.user_id), []).append(write)
+
+        for (kind, user_id), writes in by_collection.items():
+            name = tenant_collection_name(kind, user_id)
+            try:
+                collection = self._get_collection(kind, user_id, create=True)
+                if not collection:
+                    raise RuntimeError(f"collection {name} is unavailable")
+                collection.add(
+                    documents=[w.document for w in writes],
+                    metadatas=[w.metadata for w in writes],
+                    ids=[w.doc_id for w in writes],
+                )
+                for w in writes:
+                    self.lexical.add((kind, user_id), w.doc_id, w.document, w.metadata)
+                self._write_stats["written"] += len(writes)
+            except Exception as e:
+                self._write_stats["failed"] += len(writes)
+                logger.error(f"Error writing {len(writes)} documents to {name}: {e}")
+        self._write_stats["batches"] += 1
+
+    def _flush_blocking(self):
+        self._write_queue.put(_FLUSH)
+        self._write_queue.join()
+
+    async def flush(self, timeout: Optional[float] = None) -> bool:
+        """Write out everything queued so far; False if it didn't finish within timeout"""
+        if not (self._writer and self._writer.is_alive()):
+            return True
+        try:
+            await asyncio.wait_for(asyncio.to_thread(self._flush_blocking), timeout)
+            return True
+        except asyncio.TimeoutError:
+            logger.warning(f"Memory flush did not finish within {timeout}s ({self.pending_writes} pending)")
+            return False
+
+    async def close(self, timeout: Optional[float] = None):
+        """Flush pending writes and stop the writer thread"""
+        if not (self._writer and self._writer.is_alive()):
+            return
+        if await self.flush(timeout):
+            await asyncio.to_thread(self._write_queue.put, _STOP)
+            await asyncio.to_thread(self._writer.join, timeout)
+
+    @property
+    def pending_writes(self) -> int:
+        return self._write_queue.qsize()
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {**self._write_stats, "pending": self.pending_writes, "retention": dict(self._retention_stats)}
+
+    def _tenant_collections(self, kind: str) -> Dict[int, str]:
+        """user_id -> collection name for every tenant collection of a kind"""
+        pattern = re.compile(rf"^{kind}_u(\d+)$")
+        tenants = {}
+        for collection in self.client.list_collections():
+            match = pattern.match(_collection_name(collection))
+            if match:
+                tenants[int(match.group(1))] = match.group(0)
+        return tenants
+
+    def collection_sizes(self) -> Dict[str, Any]:
+        """Document counts per memory kind, plus the largest tenants"""
+        if not self.client:
+            return {}
+
+        sizes: Dict[str, Any] = {}
+        for kind in MEMORY_KINDS:
+            counts = {
+                user_id: self.client.get_collection(name).count()
+                for user_id, name in self._tenant_collections(kind).items()
+            }
+            largest = sorted(counts.items(), key=lambda item: item[1], reverse=True)[:5]
+            sizes[kind] = {
+                "tenants": len(counts),
+                "documents": sum(counts.values()),
+                "largest": [{"user_id": user_id, "documents": count} for user_id, count in largest],
+            }
+        return sizes
+
+    async def apply_retention(self):
+        """
+        Bound every user's conversation memory (scheduled job)
+
+        Turns older than MEMORY_COMPACTION_AGE_DAYS are summarized by the LLM
+        into digest documents, documents older than MEMORY_CONVERSATION_TTL_DAYS
+        are deleted, and the oldest documents beyond
+        MEMORY_MAX_CONVERSATIONS_PER_USER are trimmed.
+        """
+        if not self.client:
+            return
+
+        await self.flush()
+        tenants = await asyncio.to_thread(self._tenant_collections, "conversations")
+        llm_available = True
+        for user_id in tenants:
+            try:
+                llm_available = await self._apply_user_retention(user_id, compact=llm_available)
+            except Exception as e:
+                logger.error(f"Error applying memory retention for user {user_id}: {e}")
+
+        self._retention_stats["runs"] += 1
+        logger.info(f"Memory retention finished for {len(tenants)} users: {self._retention_stats}")
+
+    async def _apply_user_retention(self, user_id: int, compact: bool = True) -> bool:
+        """Returns False if the LLM was unavailable, so the caller can skip further compaction"""
+        collection = self._get_collection("conversations", user_id)
+        if not collection:
+            return compact
+
+        data = await asyncio.to_thread(collection.get, include=["documents", "metadatas"])
+        docs = sorted(
+            zip(data["ids"], data["documents"], data["metadatas"], strict=True),
+            key=lambda doc: _document_time(doc[2]),
+        )
+        now = datetime.now()
+
+        # 1. Age-based TTL
+        ttl_cutoff = now - timedelta(days=settings.MEMORY_CONVERSATION_TTL_DAYS)
+        expired = [doc_id for doc_id, _, meta in docs if _document_time(meta) < ttl_cutoff]
+        lexical_key = ("conversations", user_id)
+        if expired:
+            await asyncio.to_thread(collection.delete, ids=expired)
+            self.lexical.remove(lexical_key, expired)
+            self._retention_stats["expired"] += len(expired)
+            docs = docs[len(expired):]  # sorted by time, so the expired ones lead
+
+        # 2. Compact old turns into digests, one digest per full chunk
+        if compact:
+            compact_cutoff = now - timedelta(days=settings.MEMORY_COMPACTION_AGE_DAYS)
+            old_turns = [
+                doc for doc in docs
+                if (doc[2] or {}).get("type") != "digest" and _document_time(doc[2]) < compact_cutoff
+            ]
+            chunk_size = settings.MEMORY_COMPACTION_CHUNK_SIZE
+            for start in range(0, len(old_turns) - chunk_size + 1, chunk_size):
+                chunk = old_turns[start:start + chunk_size]
+                try:
+                    digest = await llm_service.summarize_conversation([text for _, text, _ in chunk])
+                except LLMError as e:
+                    logger.warning(f"LLM unavailable, skipping memory compaction: {e}")
+                    compact = False
+                    break
+
+                first, last = _document_time(chunk[0][2]), _document_time(chunk[-1][2])
+                digest_id = f"digest_{user_id}_{first.timestamp()}"
+                digest_text = f"Digest of {len(chunk)} conversations ({first:%Y-%m-%d} - {last:%Y-%m-%d}):\n{digest}"
+                digest_metadata = {
+                    "user_id": str(user_id),
+                    "type": "digest",
+                    "turns": len(chunk),
+                    "period_start": first.isoformat(),
+                    "timestamp": last.isoformat(),
+                }
+                await asyncio.to_thread(
+                    collection.upsert,
+                    ids=[digest_id],
+                    documents=[digest_text],
+                    metadatas=[digest_metadata],
+                )
+                chunk_ids = [doc_id for doc_id, _, _ in chunk]
+                await asyncio.to_thread(collection.delete, ids=chunk_ids)
+                self.lexical.add(lexical_key, digest_id, digest_text, digest_metadata)
+                self.lexical.remove(lexical_key, chunk_ids)
+                self._retention_stats["digests"] += 1
+                self._retention_stats["compacted"] += len(chunk)
+
+                removed = set(chunk_ids)
+                docs = [doc for doc in docs if doc[0] not in removed]
+                docs.append((digest_id, digest_text, digest_metadata))
+            docs.sort(key=lambda doc: _document_time(doc[2]))
+
+        # 3. Per-user document cap, oldest first
+        excess = len(docs) - settings.MEMORY_MAX_CONVERSATIONS_PER_USER
+        if excess > 0:
+            trimmed = [doc_id for doc_id, _, _ in docs[:excess]]
+            await asyncio.to_thread(collection.delete, ids=trimmed)
+            self.lexical.remove(lexical_key, trimmed)
+            self._retention_stats["trimmed"] += excess
+
+        return compact
+
     async def reset_memory(self, user_id: Optional[int] = None):
         """Reset memory (for testing or user request)"""
         try:
+            if not self.client:
+                return False
+
+            # Don't let queued writes recreate what we're deleting
+            await self.flush()
+
             if user_id:
-                # Delete only user's data
-                # ChromaDB doesn't support delete by metadata easily, so we'd need to implement this differently
-                logger.warning(f"Partial reset for user {user_id} not fully implemented")
+                # Delete only user's data: drop their collections
+                for kind in MEMORY_KINDS:
+                    name = tenant_collection_name(kind, user_id)
+                    self.lexical.drop((kind, user_id))
+                    with self._collections_lock:
+                        self._collections.pop(name, None)
+                        try:
+                            self.client.delete_collection(name)
+                        except ValueError:
+                            pass  # user had no documents of this kind
+                logger.info(f"Deleted memory collections for user {user_id}")
             else:
                 # Reset all collections
-                if self.client:
+                self.lexical.drop()
+                with self._collections_lock:
+                    self._collections.clear()
                     self.client.reset()
-                    self.conversations = self._get_or_create_collection("conversations")
-                    self.patterns = self._get_or_create_collection("patterns")
-                    self.decisions = self._get_or_create_collection("decisions")
 
             return True
         except Exception as e:
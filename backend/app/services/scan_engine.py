@@ -0,0 +1,102 @@
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, List, NamedTuple, Optional, Sequence
+from uuid import UUID
+
+from app.config import settings
+from app.database import AsyncSessionLocal
+from app.models import Competitor
+from app.services.competitor_service import competitor_service
+from app.services.llm_resilience import llm_deadline
+
+logger = logging.getLogger(__name__)
+
+
+class ScanOutcome(NamedTuple):
+    competitor_id: UUID
+    user_id: int
+    name: str
+    result: Dict[str, Any]
+
+
+class CompetitorScanEngine:
+    """
+    Runs competitor scans concurrently
+
+    At most `max_concurrency` scans run at once, each in its own DB session,
+    under the scan LLM deadline and an overall `timeout`. Per-host request
+    limits are enforced by the scraper. Once one scan reports the LLM
+    gateway as unavailable, scans that haven't started yet are skipped.
+    """
+
+    def __init__(self, max_concurrency: Optional[int] = None, timeout: Optional[float] = None):
+        self.max_concurrency = max_concurrency or settings.SCAN_MAX_CONCURRENCY
+        self.timeout = timeout or settings.SCAN_TIMEOUT
+
+    async def scan(
+        self,
+        competitors: Sequence[Competitor],
+        on_result: Optional[Callable[[ScanOutcome], Awaitable[None]]] = None,
+    ) -> List[ScanOutcome]:
+        """
+        Scan the given competitors, in input order in the returned list
+
+        Args:
+            on_result: awaited with each outcome as soon as its scan finishes
+        """
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        llm_down = asyncio.Event()
+
+        async def run(competitor: Competitor) -> ScanOutcome:
+            async with semaphore:
+                if llm_down.is_set():
+                    result = {
+                        "success": False,
+                        "error": "AI-сервис временно недоступен, попробуйте позже",
+                        "error_type": "llm_unavailable",
+                    }
+                else:
+                    result = await self.scan_one(competitor.id, competitor.user_id, competitor.name)
+                    if result.get("error_type") == "llm_unavailable":
+                        # Don't queue up more work while the LLM is down
+                        logger.warning("LLM unavailable, skipping remaining competitor scans")
+                        llm_down.set()
+
+            outcome = ScanOutcome(competitor.id, competitor.user_id, competitor.name, result)
+            if on_result is not None:
+                try:
+                    await on_result(outcome)
+                except Exception as e:
+                    logger.error(f"Error reporting scan result for {competitor.name}: {e}")
+            return outcome
+
+        return list(await asyncio.gather(*(run(c) for c in competitors)))
+
+    async def scan_one(self, competitor_id: UUID, user_id: int, name: str) -> Dict[str, Any]:
+        """Scan one competitor in its own session, never raising"""
+        logger.info(f"Scanning competitor {name} for user {user_id}")
+        try:
+            async with AsyncSessionLocal() as session:
+                with llm_deadline(settings.LLM_SCAN_DEADLINE):
+                    return await asyncio.wait_for(
+                        competitor_service.scan_competitor(session, competitor_id, user_id),
+                        self.timeout,
+                    )
+        except asyncio.TimeoutError:
+            logger.warning(f"Scan of competitor {name} timed out after {self.timeout:.0f}s")
+            return {
+                "success": False,
+                "error": "Сканирование заняло слишком много времени",
+                "error_type": "timeout",
+            }
+        except Exception as e:
+            logger.error(f"Error scanning competitor {name}: {e}")
+            return {
+                "success": False,
+                "error": "Критическая ошибка при сканировании",
+                "error_type": "unknown_error",
+            }
+
+
+# Singleton instance
+scan_engine = CompetitorScanEngine()
@@ -0,0 +1,95 @@
+import logging
+import random
+from datetime import datetime, timedelta
+from typing import Any, Dict
+
+from sqlalchemy import func, or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.models import Competitor, CompetitorAction
+from app.services.job_queue import job_queue
+
+logger = logging.getLogger(__name__)
+
+# Spread rescheduled scans by +-10% so competitors added together don't stay in lockstep
+JITTER = 0.1
+
+
+class ScanScheduler:
+    """
+    Adaptive per-competitor scan intervals
+
+    Each scan moves the competitor's interval within
+    [SCAN_INTERVAL_MIN_MINUTES, SCAN_INTERVAL_MAX_MINUTES]: it is multiplied
+    by SCAN_BACKOFF_FACTOR after a scan that found nothing new (304 or same
+    fingerprint) and divided by it after a scan that found actions. A changed
+    page without actions keeps the interval. Competitors with actions in the
+    last SCAN_ACTIVITY_WINDOW_DAYS are never scanned less often than every
+    SCAN_INTERVAL_DEFAULT_MINUTES.
+    """
+
+    @staticmethod
+    def _clamp(minutes: float) -> int:
+        return int(max(settings.SCAN_INTERVAL_MIN_MINUTES, min(settings.SCAN_INTERVAL_MAX_MINUTES, minutes)))
+
+    async def reschedule(self, db: AsyncSession, competitor: Competitor, result: Dict[str, Any]):
+        """Update the competitor's interval and next scan time from a successful scan result (caller commits)"""
+        interval = competitor.scan_interval_minutes or settings.SCAN_INTERVAL_DEFAULT_MINUTES
+
+        if result.get("unchanged"):
+            competitor.unchanged_streak = (competitor.unchanged_streak or 0) + 1
+            interval = self._clamp(interval * settings.SCAN_BACKOFF_FACTOR)
+        else:
+            competitor.unchanged_streak = 0
+            if result.get("found_actions"):
+                interval = self._clamp(interval / settings.SCAN_BACKOFF_FACTOR)
+
+        since = datetime.now() - timedelta(days=settings.SCAN_ACTIVITY_WINDOW_DAYS)
+        recent_actions = (await db.execute(
+            select(func.count())
+            .select_from(CompetitorAction)
+            .where(CompetitorAction.competitor_id == competitor.id, CompetitorAction.detected_at >= since)
+        )).scalar() or 0
+        if recent_actions:
+            interval = min(interval, self._clamp(settings.SCAN_INTERVAL_DEFAULT_MINUTES))
+
+        competitor.scan_interval_minutes = interval
+        competitor.next_scan_at = datetime.now() + timedelta(minutes=interval * random.uniform(1 - JITTER, 1 + JITTER))
+
+    async def enqueue_due(self, db: AsyncSession) -> int:
+        """
+        Enqueue scan jobs for competitors whose next scan is due
+
+        next_scan_at is pushed out by the current interval right away, so a scan
+        that fails (or is dead-lettered) is retried on the competitor's normal
+        schedule rather than on every tick. A successful scan reschedules it.
+        """
+        # One UPDATE claims the due rows, so concurrent ticks (several API replicas) don't both enqueue them
+        interval = func.coalesce(Competitor.scan_interval_minutes, settings.SCAN_INTERVAL_DEFAULT_MINUTES)
+        result = await db.execute(
+            update(Competitor)
+            .where(or_(Competitor.next_scan_at.is_(None), Competitor.next_scan_at <= func.now()))
+            .values(next_scan_at=func.now() + func.make_interval(0, 0, 0, 0, 0, interval))
+            .returning(Competitor.id, Competitor.user_id, Competitor.name)
+            .execution_options(synchronize_session=False)
+        )
+        due = result.all()
+        if not due:
+            await db.commit()
+            return 0
+
+        enqueued = await job_queue.enqueue_many(db, [
+            (
+                "competitor_scan",
+                {"competitor_id": str(competitor_id), "user_id": user_id, "name": name},
+                f"competitor_scan:{competitor_id}",
+            )
+            for competitor_id, user_id, name in due
+        ])
+        logger.info(f"Enqueued {enqueued} due competitor scans ({len(due) - enqueued} still queued from before)")
+        return enqueued
+
+
+# Singleton instance
+scan_scheduler = ScanScheduler()
@@ -1,43 +1,146 @@
+import asyncio
+import hashlib
+import re
 import httpx
 from bs4 import BeautifulSoup
 import logging
-from typing import Dict, Any
+from contextlib import asynccontextmanager
+from typing import Dict, Any, Optional
+from urllib.parse import urlsplit
+
+from app.config import settings
 
 logger = logging.getLogger(__name__)
 
+USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+def fingerprint_text(text: str) -> str:
+    """sha256 of the text with case and whitespace normalized, so re-flowed markup isn't a change"""
+    normalized = _WHITESPACE_RE.sub(" ", text.casefold()).strip()
+    return hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+
+
+def _conditional_headers(etag: Optional[str], last_modified: Optional[str]) -> Dict[str, str]:
+    headers = {}
+    if etag:
+        headers['If-None-Match'] = etag
+    if last_modified:
+        headers['If-Modified-Since'] = last_modified
+    return headers
+
+
+def _not_modified_result(etag: Optional[str], last_modified: Optional[str]) -> Dict[str, Any]:
+    return {
+        "success": True,
+        "not_modified": True,
+        "content": None,
+        "blocks": None,
+        "etag": etag,
+        "last_modified": last_modified,
+        "error": None,
+        "error_type": None
+    }
+
+
+class HostRateLimiter:
+    """Per-host politeness: at most `concurrency` requests in flight and `interval` seconds between request starts"""
+
+    def __init__(self, concurrency: int, interval: float):
+        self.concurrency = concurrency
+        self.interval = interval
+        self._semaphores: Dict[str, asyncio.Semaphore] = {}
+        self._next_start: Dict[str, float] = {}
+
+    @asynccontextmanager
+    async def slot(self, url: str):
+        host = (urlsplit(url).hostname or "").lower()
+        semaphore = self._semaphores.setdefault(host, asyncio.Semaphore(self.concurrency))
+        async with semaphore:
+            # Reserve the next start time before sleeping so concurrent waiters space out
+            now = asyncio.get_running_loop().time()
+            start = max(now, self._next_start.get(host, now))
+            self._next_start[host] = start + self.interval
+            if start > now:
+                await asyncio.sleep(start - now)
+            yield
+
+
 class ScrapingService:
-    async def fetch_url_content(self, url: str) -> Dict[str, Any]:
+    def __init__(self):
+        self._client: Optional[httpx.AsyncClient] = None
+        self._hosts = HostRateLimiter(settings.SCRAPING_PER_HOST_CONCURRENCY, settings.SCRAPING_PER_HOST_INTERVAL)
+
+    def _get_client(self) -> httpx.AsyncClient:
+        """Shared pooled client: connections (and HTTP/2 sessions) are reused across scans"""
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                http2=True,
+                follow_redirects=True,
+                headers={'User-Agent': USER_AGENT},
+                timeout=httpx.Timeout(10.0, connect=5.0),
+                limits=httpx.Limits(
+                    max_connections=settings.SCRAPING_MAX_CONNECTIONS,
+                    max_keepalive_connections=settings.SCRAPING_MAX_KEEPALIVE_CONNECTIONS,
+                    keepalive_expiry=settings.SCRAPING_KEEPALIVE_EXPIRY,
+                ),
+            )
+        return self._client
+
+    async def _get(self, url: str, **kwargs) -> httpx.Response:
+        async with self._hosts.slot(url):
+            return await self._get_client().get(url, **kwargs)
+
+    async def aclose(self):
+        """Close pooled connections (called on application shutdown)"""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def fetch_url_content(
+        self, url: str, etag: Optional[str] = None, last_modified: Optional[str] = None
+    ) -> Dict[str, Any]:
         """
         Fetches the content of a URL and extracts clean text.
-        Returns dict with {success: bool, content: str | None, error: str | None, error_type: str | None}
+        With etag/last_modified from a previous fetch the request is conditional,
+        and a 304 comes back as {success: True, not_modified: True, content: None}.
+        `blocks` is the content split into text blocks (lines), for diffing against a previous scan.
+        Returns dict with {success: bool, not_modified: bool, content: str | None, blocks: list | None,
+        etag: str | None, last_modified: str | None, error: str | None, error_type: str | None}
         """
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-        }
         try:
-            async with httpx.AsyncClient(timeout=10.0, follow_redirects=True) as client:
-                response = await client.get(url, headers=headers)
-                response.raise_for_status()  # Raise an exception for bad status codes (4xx or 5xx)
+            response = await self._get(url, headers=_conditional_headers(etag, last_modified))
+            if response.status_code == 304:
+                logger.info(f"Not modified since last scan: {url}")
+                return _not_modified_result(etag, last_modified)
+            response.raise_for_status()  # Raise an exception for bad status codes (4xx or 5xx)
 
-                # Use BeautifulSoup to parse the HTML and extract text
-                soup = BeautifulSoup(response.text, 'lxml')
+            # Use BeautifulSoup to parse the HTML and extract text
+            soup = BeautifulSoup(response.text, 'lxml')
 
-                # Remove script and style elements
-                for script_or_style in soup(["script", "style"]):
-                    script_or_style.decompose()
+            # Remove script and style elements
+            for script_or_style in soup(["script", "style"]):
+                script_or_style.decompose()
 
-                # Get text and clean it up
-                text = soup.get_text()
-                lines = (line.strip() for line in text.splitlines())
-                chunks = (phrase.strip() for line in lines for phrase in line.split("  "))
-                clean_text = '\n'.join(chunk for chunk in chunks if chunk)
+            # Get text and clean it up
+            text = soup.get_text()
+            lines = (line.strip() for line in text.splitlines())
+            chunks = (phrase.strip() for line in lines for phrase in line.split("  "))
+            blocks = [chunk for chunk in chunks if chunk]
+            clean_text = '\n'.join(blocks)
 
-                return {
-                    "success": True,
-                    "content": clean_text,
-                    "error": None,
-                    "error_type": None
-                }
+            return {
+                "success": True,
+                "not_modified": False,
+                "content": clean_text,
+                "blocks": blocks,
+                "etag": response.headers.get('etag'),
+                "last_modified": response.headers.get('last-modified'),
+                "error": None,
+                "error_type": None
+            }
 
         except httpx.TimeoutException:
             error_msg = "Сайт не отвечает (превышен timeout)"
@@ -83,15 +186,18 @@ class ScrapingService:
                 "error_type": "unknown_error"
             }
 
-    async def fetch_telegram_channel_content(self, channel_username: str) -> Dict[str, Any]:
+    async def fetch_telegram_channel_content(
+        self, channel_username: str, etag: Optional[str] = None, last_modified: Optional[str] = None
+    ) -> Dict[str, Any]:
         """
         Fetches recent posts from a public Telegram channel via web interface.
 
         Args:
             channel_username: Telegram channel username (without @)
+            etag, last_modified: validators from a previous fetch, to make the request conditional
 
         Returns:
-            dict with {success: bool, content: str | None, error: str | None, error_type: str | None}
+            dict with the same keys as fetch_url_content, one block per post
         """
         # Remove @ if present
         channel_username = channel_username.lstrip('@')
@@ -101,46 +207,52 @@ class ScrapingService:
 
         logger.info(f"Fetching Telegram channel: {url}")
 
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-        }
-
         try:
-            async with httpx.AsyncClient(timeout=15.0, follow_redirects=True) as client:
-                response = await client.get(url, headers=headers)
-                response.raise_for_status()
-
-                soup = BeautifulSoup(response.text, 'lxml')
-
-                # Telegram message divs have class 'tgme_widget_message_text'
-                messages = soup.find_all('div', class_='tgme_widget_message_text')
-
-                if not messages:
-                    logger.warning(f"No messages found for channel {channel_username}")
-                    return {
-                        "success": False,
-                        "content": None,
-                        "error": "Канал не найден или пуст",
-                        "error_type": "no_content"
-                    }
-
-                # Extract text from recent messages (limit to last 10)
-                recent_posts = []
-                for msg in messages[:10]:
-                    text = msg.get_text(strip=True)
-                    if text:
-                        recent_posts.append(text)
-
-                combined_text = '\n\n---\n\n'.join(recent_posts)
-                logger.info(f"Successfully fetched {len(recent_posts)} messages from {channel_username}")
+            response = await self._get(
+                url,
+                headers=_conditional_headers(etag, last_modified),
+                timeout=httpx.Timeout(15.0, connect=5.0),
+            )
+            if response.status_code == 304:
+                logger.info(f"Telegram channel {channel_username} not modified since last scan")
+                return _not_modified_result(etag, last_modified)
+            response.raise_for_status()
 
+            soup = BeautifulSoup(response.text, 'lxml')
+
+            # Telegram message divs have class 'tgme_widget_message_text'
+            messages = soup.find_all('div', class_='tgme_widget_message_text')
+
+            if not messages:
+                logger.warning(f"No messages found for channel {channel_username}")
                 return {
-                    "success": True,
-                    "content": combined_text,
-                    "error": None,
-                    "error_type": None
+                    "success": False,
+                    "content": None,
+                    "error": "Канал не найден или пуст",
+                    "error_type": "no_content"
                 }
 
+            # Extract text from recent messages (limit to last 10)
+            recent_posts = []
+            for msg in messages[:10]:
+                text = msg.get_text(strip=True)
+                if text:
+                    recent_posts.append(text)
+
+            combined_text = '\n\n---\n\n'.join(recent_posts)
+            logger.info(f"Successfully fetched {len(recent_posts)} messages from {channel_username}")
+
+            return {
+                "success": True,
+                "not_modified": False,
+                "content": combined_text,
+                "blocks": recent_posts,
+                "etag": response.headers.get('etag'),
+                "last_modified": response.headers.get('last-modified'),
+                "error": None,
+                "error_type": None
+            }
+
         except httpx.TimeoutException:
             error_msg = "Telegram не отвечает (превышен timeout)"
             logger.error(f"Timeout while requesting Telegram channel {channel_username}")
@@ -0,0 +1,43 @@
+from typing import List, Tuple
+
+import numpy as np
+
+
+def normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    """L2-normalize each row as float32 (zero rows stay zero)"""
+    matrix = np.asarray(matrix, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return matrix / np.maximum(norms, np.finfo(np.float32).tiny)
+
+
+def top_k_matches(
+    queries: np.ndarray,
+    candidates: np.ndarray,
+    k: int,
+    threshold: float = 0.0,
+) -> List[List[Tuple[int, float]]]:
+    """
+    Cosine top-k for every query row against every candidate row
+
+    Computes the full similarity matrix with a single matmul and selects each
+    row's top k with argpartition instead of a full sort.
+
+    Returns:
+        Per query, (candidate_index, score) pairs with score >= threshold,
+        best first
+    """
+    if len(queries) == 0 or len(candidates) == 0 or k <= 0:
+        return [[] for _ in range(len(queries))]
+
+    scores = normalize_rows(queries) @ normalize_rows(candidates).T
+    k = min(k, scores.shape[1])
+    top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    top_scores = np.take_along_axis(scores, top, axis=1)
+    order = np.argsort(-top_scores, axis=1)
+    top = np.take_along_axis(top, order, axis=1)
+    top_scores = np.take_along_axis(top_scores, order, axis=1)
+
+    return [
+        [(int(i), float(s)) for i, s in zip(row, row_scores, strict=True) if s >= threshold]
+        for row, row_scores in zip(top, top_scores, strict=True)
+    ]
@@ -0,0 +1,138 @@
+import json
+import re
+from typing import Any
+
+from pydantic import TypeAdapter
+
+from app.services.llm_resilience import LLMError
+
+_FENCE_RE = re.compile(r"```(?:json|JSON)?\s*(.*?)(?:```|$)", re.DOTALL)
+_TRAILING_COMMA_RE = re.compile(r",\s*([}\]])")
+_DANGLING_TAIL_RE = re.compile(r'(,?\s*"(?:[^"\\]|\\.)*"\s*:\s*|,\s*)$')
+
+
+class StructuredOutputError(LLMError):
+    """LLM output could not be parsed into the expected schema"""
+
+
+def extract_json(text: str, allow_truncated: bool = True) -> Any:
+    """
+    Tolerantly extract the first JSON value from LLM output
+
+    Handles ``` fences, prose before/after the JSON, trailing commas and
+    output truncated by max_tokens (open strings and brackets are closed).
+    With allow_truncated=False truncated output is an error instead, for
+    callers where a partial answer (e.g. a cut-off list) would be taken as
+    complete.
+
+    Raises:
+        ValueError: no JSON value could be recovered
+    """
+    if not text:
+        raise ValueError("Empty LLM response")
+
+    candidate = text.strip()
+    fenced = _FENCE_RE.search(candidate)
+    if fenced:
+        candidate = fenced.group(1).strip()
+
+    try:
+        return json.loads(candidate)
+    except json.JSONDecodeError:
+        pass
+
+    start = min((i for i in (candidate.find("{"), candidate.find("[")) if i != -1), default=-1)
+    if start == -1:
+        raise ValueError("No JSON object or array found in LLM response")
+
+    fragment, stack, in_string = _scan_json(candidate[start:])
+    if not stack and not in_string:
+        return _loads_lenient(fragment)
+    if not allow_truncated:
+        raise ValueError("LLM response was cut off before the JSON was complete")
+
+    # Truncated output: close the open string, drop a dangling key/comma and
+    # close the brackets; if that fails, cut back to the previous element
+    repaired = fragment + ('"' if in_string else "")
+    for _ in range(5):
+        trimmed = _DANGLING_TAIL_RE.sub("", repaired.rstrip())
+        _, stack, in_string = _scan_json(trimmed)
+        if not in_string:
+            try:
+                return _loads_lenient(trimmed + "".join(reversed(stack)))
+            except ValueError:
+                pass
+        cut = repaired.rfind(",")
+        if cut == -1:
+            break
+        repaired = repaired[:cut]
+
+    raise ValueError("Could not recover JSON from LLM response")
+
+
+def _loads_lenient(text: str) -> Any:
+    """json.loads, retrying once with trailing commas removed"""
+    try:
+        return json.loads(text)
+    except json.JSONDecodeError:
+        pass
+    try:
+        return json.loads(_TRAILING_COMMA_RE.sub(r"\1", text))
+    except json.JSONDecodeError as e:
+        raise ValueError(f"Could not recover JSON from LLM response: {e}") from e
+
+
+def _scan_json(text: str) -> tuple[str, list, bool]:
+    """Return the text up to the end of the first balanced JSON value, plus any still-open closers"""
+    closers = {"{": "}", "[": "]"}
+    stack: list = []
+    in_string = False
+    escaped = False
+
+    for i, ch in enumerate(text):
+        if in_string:
+            if escaped:
+                escaped = False
+            elif ch == "\\":
+                escaped = True
+            elif ch == '"':
+                in_string = False
+            continue
+
+        if ch == '"':
+            in_string = True
+        elif ch in closers:
+            stack.append(closers[ch])
+        elif ch in "}]":
+            if stack and stack[-1] == ch:
+                stack.pop()
+            if not stack:
+                return text[:i + 1], [], False
+
+    return text, stack, in_string
+
+
+def parse_structured(text: str, adapter: TypeAdapter, allow_truncated: bool = True) -> Any:
+    """
+    Extract JSON from LLM output and validate it against a schema
+
+    Raises:
+        ValueError: extraction or validation failed (pydantic's
+            ValidationError is a ValueError)
+    """
+    return adapter.validate_python(extract_json(text, allow_truncated))
+
+
+def build_repair_messages(messages: list, raw_output: str, error: Exception) -> list:
+    """Follow-up conversation asking the model to fix its previous output"""
+    return messages + [
+        {"role": "assistant", "content": raw_output},
+        {
+            "role": "user",
+            "content": (
+                "Your previous response could not be parsed into the required JSON format.\n"
+                f"Error: {str(error)[:1000]}\n"
+                "Respond again with ONLY the corrected JSON, without explanations or markdown."
+            ),
+        },
+    ]
@@ -2,16 +2,45 @@ import json
 import logging
 from datetime import datetime, timedelta
 from typing import Dict, List
+from pydantic import BaseModel, model_validator
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 from sqlalchemy import func, desc
 import pandas as pd
 
+from app.config import settings
 from app.models import FinancialTransaction, CompetitorAction, LegalUpdate, Competitor, MarketTrend
 from app.services.llm_service import llm_service
+from app.services.llm_resilience import LLMError
+from app.services.structured_output import StructuredOutputError
 
 logger = logging.getLogger(__name__)
 
+# LLM output schemas
+class TrendRecommendation(BaseModel):
+    action: str = ""
+    justification: str = ""
+
+
+class TrendInsight(BaseModel):
+    insight_type: str = "General"
+    title: str = "Untitled Trend"
+    observation: str = ""
+    recommendation: TrendRecommendation = TrendRecommendation()
+
+
+class TrendAnalysis(BaseModel):
+    insights: List[TrendInsight]
+
+    @model_validator(mode="before")
+    @classmethod
+    def wrap_list(cls, data):
+        # The prompt asks for a bare array; some models wrap it in {"insights": [...]}
+        if isinstance(data, list):
+            return {"insights": data}
+        return data
+
+
 class TrendsService:
 
     async def identify_trends(self, db: AsyncSession, user_id: int) -> Dict:
@@ -64,50 +93,41 @@ class TrendsService:
         prompt = self._build_consultant_prompt(financial_dossier, competitor_actions, legal_updates)
         
         # 3. --- Call LLM ---
-        response_str = await llm_service._call_llm([{"role": "user", "content": prompt}])
-
+        # The prompt asks for a bare JSON array, so JSON mode (objects only) stays off
         try:
-            # Remove markdown code blocks if present
-            cleaned_response = response_str.strip()
-            if cleaned_response.startswith('```json'):
-                cleaned_response = cleaned_response[7:]  # Remove ```json
-            if cleaned_response.startswith('```'):
-                cleaned_response = cleaned_response[3:]  # Remove ```
-            if cleaned_response.endswith('```'):
-                cleaned_response = cleaned_response[:-3]  # Remove trailing ```
-            cleaned_response = cleaned_response.strip()
-
-            trends = json.loads(cleaned_response)
-
-            # Handle both list format and dict format with 'insights' key
-            if isinstance(trends, dict) and 'insights' in trends:
-                trends = trends['insights']
-
-            # 4. --- Persist trends to database ---
-            if isinstance(trends, list):
-                for trend_data in trends:
-                    market_trend = MarketTrend(
-                        user_id=user_id,
-                        title=trend_data.get('title', 'Untitled Trend'),
-                        insight_type=trend_data.get('insight_type', 'General'),
-                        observation=trend_data.get('observation', ''),
-                        recommendation_action=trend_data.get('recommendation', {}).get('action', ''),
-                        recommendation_justification=trend_data.get('recommendation', {}).get('justification', ''),
-                        strength_score=0.8,  # Default confidence
-                        category='strategic'
-                    )
-                    db.add(market_trend)
-
-                await db.commit()
-                logger.info(f"Persisted {len(trends)} trends to database for user {user_id}")
-
-                return trends
-            else:
-                logger.warning("Trends response is not a list")
-                return []
-        except json.JSONDecodeError:
-            logger.error(f"Failed to decode trends JSON from LLM: {response_str}")
+            result = await llm_service.generate_structured(
+                [{"role": "user", "content": prompt}],
+                TrendAnalysis,
+                cache_ttl=settings.LLM_CACHE_TTL_TRENDS,
+                json_mode=False,
+            )
+        except StructuredOutputError as e:
+            logger.error(f"Failed to decode trends JSON from LLM: {e}")
             return []  # Return empty list to match response type
+        except LLMError as e:
+            logger.error(f"LLM unavailable for trend analysis: {e}")
+            return []
+
+        trends = [insight.model_dump() for insight in result.insights]
+
+        # 4. --- Persist trends to database ---
+        for trend_data in trends:
+            market_trend = MarketTrend(
+                user_id=user_id,
+                title=trend_data['title'],
+                insight_type=trend_data['insight_type'],
+                observation=trend_data['observation'],
+                recommendation_action=trend_data['recommendation']['action'],
+                recommendation_justification=trend_data['recommendation']['justification'],
+                strength_score=0.8,  # Default confidence
+                category='strategic'
+            )
+            db.add(market_trend)
+
+        await db.commit()
+        logger.info(f"Persisted {len(trends)} trends to database for user {user_id}")
+
+        return trends
 
     def _build_consultant_prompt(self, financials: Dict, competitors: List, legals: List) -> str:
         # This prompt is structured exactly as designed in the planning phase.
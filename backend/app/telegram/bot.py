@@ -1,4 +1,5 @@
 from telegram import Update, WebAppInfo, InlineKeyboardButton, InlineKeyboardMarkup
+from telegram.error import BadRequest, RetryAfter
 from telegram.ext import (
     Application,
     CommandHandler,
@@ -10,8 +11,11 @@ from telegram.ext import (
 )
 from app.config import settings
 from app.services.llm_service import llm_service
+from app.services.memory_service import memory_service
+from app.services.context_assembler import context_assembler
 from app.agents.briefing_agent import briefing_agent
 from app.services.competitor_service import competitor_service
+from app.services.scan_engine import scan_engine
 from app.services.legal_service import legal_service
 from app.services.finance_service import finance_service
 from app.services.trends_service import trends_service
@@ -20,10 +24,12 @@ from app.models import User, AutonomousAction, BusinessContext, Competitor, Lega
 from sqlalchemy import select
 from datetime import datetime
 from passlib.context import CryptContext
+import asyncio
 import logging
 import io
 import tempfile
 import os
+import time
 
 logger = logging.getLogger(__name__)
 
@@ -42,6 +48,10 @@ SELECT_MODE = range(1)
 # Conversation states for competitor addition
 COMPETITOR_NAME, COMPETITOR_URL = range(2)
 
+# Streaming replies: minimum seconds between message edits, Telegram text limit
+STREAM_EDIT_INTERVAL = 1.0
+TELEGRAM_MESSAGE_LIMIT = 4096
+
 
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Start command handler with mode selection"""
@@ -715,48 +725,42 @@ async def scancompetitors_command(update: Update, context: ContextTypes.DEFAULT_
             )
             competitors = result.scalars().all()
 
-            if not competitors:
-                await update.message.reply_text("У вас пока нет конкурентов для сканирования.")
-                return
+        if not competitors:
+            await update.message.reply_text("У вас пока нет конкурентов для сканирования.")
+            return
 
-            scanned = 0
-            failed = 0
-            for comp in competitors:
-                try:
-                    scan_result = await competitor_service.scan_competitor(session, comp.id, user_id)
-                    if not scan_result.get("success", False):
-                        failed += 1
-                        error_msg = scan_result.get('error', 'Неизвестная ошибка')
-                        details = scan_result.get('details', [])
-                        response_text = f"⚠️ {comp.name}: {error_msg}"
-                        if details:
-                            response_text += "\n\nПодробности:\n"
-                            for detail in details:
-                                response_text += f"• {detail}\n"
-                        await update.message.reply_text(response_text)
-                    else:
-                        scanned += 1
-                        actions_found = scan_result.get('found_actions', 0)
-                        if actions_found > 0:
-                            await update.message.reply_text(
-                                f"✅ {comp.name}: найдено {actions_found} изменений!"
-                            )
-                        else:
-                            await update.message.reply_text(
-                                f"✅ {comp.name}: {scan_result.get('message', 'изменений не обнаружено')}"
-                            )
-                except Exception as e:
-                    logger.error(f"Error scanning competitor {comp.name}: {e}")
-                    failed += 1
+        # Competitors are scanned concurrently; report each one as it finishes
+        async def report(outcome):
+            scan_result = outcome.result
+            if not scan_result.get("success", False):
+                error_msg = scan_result.get('error', 'Неизвестная ошибка')
+                details = scan_result.get('details', [])
+                response_text = f"⚠️ {outcome.name}: {error_msg}"
+                if details:
+                    response_text += "\n\nПодробности:\n"
+                    for detail in details:
+                        response_text += f"• {detail}\n"
+                await update.message.reply_text(response_text)
+            else:
+                actions_found = scan_result.get('found_actions', 0)
+                if actions_found > 0:
                     await update.message.reply_text(
-                        f"❌ {comp.name}: Критическая ошибка при сканировании"
+                        f"✅ {outcome.name}: найдено {actions_found} изменений!"
+                    )
+                else:
+                    await update.message.reply_text(
+                        f"✅ {outcome.name}: {scan_result.get('message', 'изменений не обнаружено')}"
                     )
 
-            await update.message.reply_text(
-                f"📊 Сканирование завершено!\n\n"
-                f"✅ Успешно: {scanned}\n"
-                f"❌ Ошибок: {failed}"
-            )
+        outcomes = await scan_engine.scan(competitors, on_result=report)
+        scanned = sum(1 for outcome in outcomes if outcome.result.get("success", False))
+        failed = len(outcomes) - scanned
+
+        await update.message.reply_text(
+            f"📊 Сканирование завершено!\n\n"
+            f"✅ Успешно: {scanned}\n"
+            f"❌ Ошибок: {failed}"
+        )
     except Exception as e:
         logger.error(f"Error scanning competitors: {e}")
         await update.message.reply_text("❌ Ошибка при сканировании конкурентов.")
@@ -1101,18 +1105,42 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
     db_user = await _get_or_create_user(user)
     user_message = update.message.text
 
-    # Get business context
+    # Get business context, plus history and memory packed under the token budget
     business_context = await _get_business_context(db_user.id)
+    async with AsyncSessionLocal() as session:
+        chat_context = await context_assembler.assemble(session, db_user.id, user_message, business_context)
 
-    # Process with LLM
+    # Stream the LLM response into a placeholder message
     try:
-        result = await llm_service.process_with_context(
-            message=user_message, business_context=business_context
-        )
-
-        response = result["response"]
+        placeholder = await update.message.reply_text("✍️ Думаю...")
+
+        parts = []
+        last_edit = time.monotonic()
+        async for delta in llm_service.stream_with_context(
+            message=user_message,
+            business_context=business_context,
+            conversation_history=chat_context.conversation_history,
+            retrieved_context=chat_context.retrieved_context,
+        ):
+            parts.append(delta)
+            # Throttle edits to stay within Telegram's flood limits
+            if time.monotonic() - last_edit >= STREAM_EDIT_INTERVAL:
+                await _edit_streamed_message(placeholder, "".join(parts)[:TELEGRAM_MESSAGE_LIMIT - 2] + " ▌")
+                last_edit = time.monotonic()
+
+        result = llm_service.build_result("".join(parts), business_context)
+        response = result["response"] or "Извините, не удалось получить ответ."
+
+        if result["response"]:
+            await memory_service.store_conversation(
+                user_id=db_user.id,
+                user_message=user_message,
+                ai_response=result["response"],
+                context=business_context,
+            )
 
         # If action requires approval, add buttons
+        reply_markup = None
         if result["requires_approval"]:
             keyboard = [
                 [
@@ -1121,15 +1149,47 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
                 ],
                 [InlineKeyboardButton("📋 Подробнее", callback_data="action_details")],
             ]
-            await update.message.reply_text(response, reply_markup=InlineKeyboardMarkup(keyboard))
-        else:
-            await update.message.reply_text(response)
+            reply_markup = InlineKeyboardMarkup(keyboard)
+
+        # Final text: first chunk replaces the placeholder, overflow goes to new messages
+        chunks = [response[i:i + TELEGRAM_MESSAGE_LIMIT] for i in range(0, len(response), TELEGRAM_MESSAGE_LIMIT)]
+        await _edit_streamed_message(placeholder, chunks[0], reply_markup if len(chunks) == 1 else None, final=True)
+        for i, chunk in enumerate(chunks[1:], start=2):
+            await update.message.reply_text(chunk, reply_markup=reply_markup if i == len(chunks) else None)
 
     except Exception as e:
         logger.error(f"Error processing message: {e}")
         await update.message.reply_text("Извините, произошла ошибка. Попробуйте еще раз.")
 
 
+async def _edit_streamed_message(message, text: str, reply_markup=None, final: bool = False):
+    """
+    Edit a streamed reply, ignoring 'not modified' errors
+
+    Intermediate edits are skipped under flood control. The final edit waits
+    it out and retries once, then sends the text as a new message, so the
+    reply never stays truncated or without its buttons.
+    """
+    try:
+        await message.edit_text(text, reply_markup=reply_markup)
+    except RetryAfter as e:
+        if not final:
+            logger.debug(f"Skipping streamed edit, flood control for {e.retry_after}s")
+            return
+        logger.warning(f"Flood control on final streamed edit, retrying in {e.retry_after}s")
+        await asyncio.sleep(e.retry_after)
+        try:
+            await message.edit_text(text, reply_markup=reply_markup)
+        except Exception as retry_error:
+            if isinstance(retry_error, BadRequest) and "not modified" in str(retry_error).lower():
+                return
+            logger.warning(f"Final streamed edit failed again, sending a new message: {retry_error}")
+            await message.reply_text(text, reply_markup=reply_markup)
+    except BadRequest as e:
+        if "not modified" not in str(e).lower():
+            raise
+
+
 async def button_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle button callbacks"""
     query = update.callback_query
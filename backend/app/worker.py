@@ -0,0 +1,177 @@
+"""
+Scan job worker: claims jobs from the scan_jobs queue and runs them.
+
+Run any number of these next to the API, which only enqueues jobs:
+    python -m app.worker
+"""
+import asyncio
+import logging
+import os
+import signal
+import socket
+from typing import Any, Awaitable, Callable, Dict, Optional, Set
+from uuid import UUID
+
+from app.config import settings
+from app.database import AsyncSessionLocal
+from app.models import ScanJob
+from app.services.job_queue import job_queue
+from app.services.legal_service import legal_service
+from app.services.llm_limiter import Priority, llm_priority
+from app.services.scan_engine import scan_engine
+from app.services.scraping_service import scraping_service
+
+logger = logging.getLogger(__name__)
+
+# Scan results worth another attempt; the rest (e.g. a site that is down) wait for the next scheduled scan
+RETRYABLE_SCAN_ERRORS = {"llm_unavailable", "llm_parse_error", "timeout", "database_error", "unknown_error"}
+
+
+# How often a finished legal scan checks whether all its per-user jobs are done
+LEGAL_SCAN_FINALIZE_DELAY = 60.0
+
+
+class JobFailed(Exception):
+    """A job finished with a result that should be retried"""
+
+
+class JobDeferred(Exception):
+    """A job can't run yet; it is put back in the queue without using up an attempt"""
+
+    def __init__(self, reason: str, delay: float):
+        super().__init__(reason)
+        self.delay = delay
+
+
+async def run_competitor_scan(payload: Dict[str, Any]):
+    result = await scan_engine.scan_one(
+        UUID(payload["competitor_id"]), payload["user_id"], payload.get("name", payload["competitor_id"])
+    )
+    if result.get("error_type") in RETRYABLE_SCAN_ERRORS:
+        raise JobFailed(f"{result['error_type']}: {result.get('error')}")
+
+
+async def run_legal_scan(payload: Dict[str, Any]):
+    async with AsyncSessionLocal() as session:
+        await legal_service.enqueue_daily_scan(session)
+
+
+async def run_legal_scan_user(payload: Dict[str, Any]):
+    async with AsyncSessionLocal() as session:
+        if not await legal_service.process_user_articles(session, payload["user_id"], payload["articles"]):
+            raise JobFailed("llm_unavailable: legal analysis aborted")
+
+
+async def run_legal_scan_finalize(payload: Dict[str, Any]):
+    async with AsyncSessionLocal() as session:
+        if not await legal_service.finish_daily_scan(session, payload["batch_id"], payload["urls"]):
+            raise JobDeferred("per-user legal analysis still running", LEGAL_SCAN_FINALIZE_DELAY)
+
+
+HANDLERS: Dict[str, Callable[[Dict[str, Any]], Awaitable[None]]] = {
+    "competitor_scan": run_competitor_scan,
+    "legal_scan": run_legal_scan,
+    "legal_scan_user": run_legal_scan_user,
+    "legal_scan_finalize": run_legal_scan_finalize,
+}
+
+
+class Worker:
+    def __init__(self, worker_id: Optional[str] = None, concurrency: Optional[int] = None, poll_interval: Optional[float] = None):
+        self.worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}"
+        self.concurrency = concurrency or settings.WORKER_CONCURRENCY
+        self.poll_interval = poll_interval or settings.WORKER_POLL_INTERVAL
+        self._running: Set[asyncio.Task] = set()
+        self._stopping = asyncio.Event()
+
+    def stop(self):
+        """Stop claiming new jobs; running ones are finished"""
+        logger.info("Worker stopping, finishing running jobs...")
+        self._stopping.set()
+
+    async def run(self):
+        logger.info(f"Worker {self.worker_id} started ({self.concurrency} concurrent jobs)")
+        while not self._stopping.is_set():
+            jobs = []
+            free = self.concurrency - len(self._running)
+            if free > 0:
+                try:
+                    async with AsyncSessionLocal() as db:
+                        await job_queue.dead_letter_expired(db)
+                        jobs = await job_queue.claim(db, self.worker_id, free, kinds=list(HANDLERS))
+                except Exception as e:
+                    logger.error(f"Error claiming jobs: {e}")
+
+            for job in jobs:
+                task = asyncio.create_task(self._execute(job))
+                self._running.add(task)
+                task.add_done_callback(self._running.discard)
+
+            if len(jobs) < free:
+                # Queue drained (or the claim failed): wait for a job to finish, the poll interval or stop()
+                stopping = asyncio.create_task(self._stopping.wait())
+                await asyncio.wait({stopping, *self._running}, timeout=self.poll_interval, return_when=asyncio.FIRST_COMPLETED)
+                stopping.cancel()
+            elif free <= 0:
+                await asyncio.wait(self._running, return_when=asyncio.FIRST_COMPLETED)
+
+        if self._running:
+            await asyncio.gather(*self._running, return_exceptions=True)
+        logger.info(f"Worker {self.worker_id} stopped")
+
+    async def _execute(self, job: ScanJob):
+        logger.info(f"Running job {job.kind} {job.id} (attempt {job.attempts}/{job.max_attempts})")
+        heartbeat = asyncio.create_task(self._renew_lease(job))
+        try:
+            with llm_priority(Priority.BACKGROUND):
+                await HANDLERS[job.kind](job.payload)
+        except JobDeferred as e:
+            logger.info(f"Job {job.kind} {job.id} deferred: {e}")
+            await self._finish(job, defer=e.delay)
+        except Exception as e:
+            logger.warning(f"Job {job.kind} {job.id} failed: {e}")
+            await self._finish(job, error=str(e) or type(e).__name__)
+        else:
+            await self._finish(job)
+        finally:
+            heartbeat.cancel()
+
+    async def _renew_lease(self, job: ScanJob):
+        while True:
+            await asyncio.sleep(job_queue.lease_seconds / 3)
+            try:
+                async with AsyncSessionLocal() as db:
+                    if not await job_queue.renew_lease(db, job.id, self.worker_id):
+                        logger.warning(f"Lost the lease on job {job.kind} {job.id}")
+                        return
+            except Exception as e:
+                logger.error(f"Error renewing lease on job {job.id}: {e}")
+
+    async def _finish(self, job: ScanJob, error: Optional[str] = None, defer: Optional[float] = None):
+        # If this fails the lease expires and the job runs again
+        try:
+            async with AsyncSessionLocal() as db:
+                if defer is not None:
+                    await job_queue.defer(db, job, self.worker_id, defer)
+                elif error is None:
+                    await job_queue.complete(db, job.id, self.worker_id)
+                else:
+                    await job_queue.fail(db, job, self.worker_id, error)
+        except Exception as e:
+            logger.error(f"Error recording the result of job {job.id}: {e}")
+
+
+async def main():
+    worker = Worker()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, worker.stop)
+    try:
+        await worker.run()
+    finally:
+        await scraping_service.aclose()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(main())
@@ -0,0 +1,118 @@
+"""
+Benchmark the torch and int8 ONNX embedding backends and check their parity.
+
+Parity compares what the legal scan actually uses: per-text cosine between
+the two backends' vectors, and the business-context x article similarity
+scores and top-k matches. Exits with status 1 if parity is below the limits.
+
+Usage:
+    python export_onnx_embeddings.py      # once
+    python benchmark_embeddings.py [--texts 512] [--repeats 3]
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+# Add app directory to path
+sys.path.append(str(Path(__file__).parent))
+
+from app.config import settings
+from app.services.onnx_embeddings import OnnxEmbeddingModel
+from app.services.similarity import normalize_rows, top_k_matches
+
+ARTICLE_TEMPLATES = [
+    "Изменения в порядке применения контрольно-кассовой техники для {}",
+    "Минфин разъяснил порядок уплаты НДС при упрощенной системе налогообложения для {}",
+    "Новые требования к маркировке товаров вступают в силу для {}",
+    "Роспотребнадзор обновил санитарные правила для {}",
+    "Изменения в Трудовом кодексе: оформление сезонных работников в {}",
+    "Лицензирование розничной продажи алкоголя: новые правила для {}",
+    "ФНС напоминает о сроках сдачи отчетности для {}",
+    "Повышение МРОТ и страховых взносов затронет {}",
+]
+BUSINESS_CONTEXTS = [
+    "industry: общественное питание, business_type: кофейня, legal_form: ИП, location: москва",
+    "industry: розничная торговля, business_type: магазин одежды, legal_form: ООО, location: казань",
+    "industry: услуги, business_type: салон красоты, legal_form: ИП, location: санкт-петербург",
+    "industry: производство, business_type: пекарня, legal_form: ООО, location: екатеринбург",
+    "industry: IT, business_type: разработка ПО, legal_form: ООО, location: новосибирск",
+]
+SUBJECTS = ["кафе и ресторанов", "малого бизнеса", "индивидуальных предпринимателей",
+            "розничных магазинов", "салонов красоты", "производителей продуктов питания"]
+
+
+def build_texts(count: int) -> list:
+    texts = []
+    for i in range(count):
+        template = ARTICLE_TEMPLATES[i % len(ARTICLE_TEMPLATES)]
+        texts.append(f"{template.format(SUBJECTS[i % len(SUBJECTS)])} (№{i})")
+    return texts
+
+
+def time_encode(model, texts: list, repeats: int) -> float:
+    """Best wall time over `repeats` runs, after one warm-up"""
+    model.encode(texts[:8])
+    best = float("inf")
+    for _ in range(repeats):
+        started = time.perf_counter()
+        model.encode(texts)
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--texts", type=int, default=512)
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--onnx-path", default=settings.EMBEDDING_ONNX_PATH)
+    parser.add_argument("--min-cosine", type=float, default=0.98,
+                        help="minimum per-text cosine between backends")
+    parser.add_argument("--max-score-diff", type=float, default=0.05,
+                        help="maximum abs difference of context x article scores")
+    args = parser.parse_args()
+
+    from sentence_transformers import SentenceTransformer
+
+    print(f"📦 Loading torch model {settings.EMBEDDING_MODEL} and ONNX model from {args.onnx_path}...")
+    torch_model = SentenceTransformer(settings.EMBEDDING_MODEL, device="cpu")
+    onnx_model = OnnxEmbeddingModel(args.onnx_path)
+    texts = build_texts(args.texts)
+
+    # Speed
+    torch_time = time_encode(torch_model, texts, args.repeats)
+    onnx_time = time_encode(onnx_model, texts, args.repeats)
+    print(f"\n⏱️  {len(texts)} texts, best of {args.repeats}")
+    print(f"   torch: {torch_time:.2f}s ({len(texts) / torch_time:.0f} texts/s)")
+    print(f"   onnx:  {onnx_time:.2f}s ({len(texts) / onnx_time:.0f} texts/s)")
+    print(f"   speedup: {torch_time / onnx_time:.2f}x")
+
+    # Parity of the vectors themselves
+    torch_vectors = normalize_rows(torch_model.encode(texts))
+    onnx_vectors = normalize_rows(onnx_model.encode(texts))
+    cosines = (torch_vectors * onnx_vectors).sum(axis=1)
+    print(f"\n🎯 Per-text cosine torch vs onnx: min {cosines.min():.4f}, mean {cosines.mean():.4f}")
+
+    # Parity of the legal-scan scores: contexts x articles
+    torch_contexts = normalize_rows(torch_model.encode(BUSINESS_CONTEXTS))
+    onnx_contexts = normalize_rows(onnx_model.encode(BUSINESS_CONTEXTS))
+    score_diff = np.abs(torch_contexts @ torch_vectors.T - onnx_contexts @ onnx_vectors.T).max()
+    torch_top = top_k_matches(torch_contexts, torch_vectors, 5)
+    onnx_top = top_k_matches(onnx_contexts, onnx_vectors, 5)
+    overlap = np.mean([
+        len({i for i, _ in a} & {i for i, _ in b}) / max(len(a), 1)
+        for a, b in zip(torch_top, onnx_top, strict=True)
+    ])
+    print(f"   Max context x article score diff: {score_diff:.4f}")
+    print(f"   Top-5 match overlap: {overlap:.0%}")
+
+    if cosines.min() < args.min_cosine or score_diff > args.max_score_diff:
+        print("\n❌ ONNX backend is outside the parity limits")
+        sys.exit(1)
+    print("\n✅ ONNX backend matches the torch backend")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""
+Export the embedding model to an int8-quantized ONNX model for EMBEDDING_BACKEND=onnx.
+Needs torch and sentence-transformers (only at export time).
+
+Usage:
+    python export_onnx_embeddings.py [--output ./models/embeddings-int8]
+"""
+import argparse
+import os
+import sys
+from pathlib import Path
+
+# Add app directory to path
+sys.path.append(str(Path(__file__).parent))
+
+from app.config import settings
+from app.services.onnx_embeddings import ONNX_MODEL_FILE, TOKENIZER_FILE
+
+
+def export(model_name: str, output_dir: str):
+    import torch
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+    from sentence_transformers import SentenceTransformer
+
+    os.makedirs(output_dir, exist_ok=True)
+    fp32_path = os.path.join(output_dir, "model_fp32.onnx")
+
+    print(f"📦 Loading {model_name}...")
+    st_model = SentenceTransformer(model_name, device="cpu")
+    transformer = st_model[0].auto_model.eval()
+    tokenizer = st_model.tokenizer
+
+    # Same weights and tokenizer as the torch backend; pooling happens in OnnxEmbeddingModel
+    sample = tokenizer(["export sample"], return_tensors="pt")
+    input_names = [name for name in ("input_ids", "attention_mask", "token_type_ids") if name in sample]
+    dynamic_axes = {name: {0: "batch", 1: "sequence"} for name in input_names}
+    dynamic_axes["last_hidden_state"] = {0: "batch", 1: "sequence"}
+
+    print("🔧 Exporting to ONNX...")
+    with torch.no_grad():
+        torch.onnx.export(
+            transformer,
+            tuple(sample[name] for name in input_names),
+            fp32_path,
+            input_names=input_names,
+            output_names=["last_hidden_state"],
+            dynamic_axes=dynamic_axes,
+            opset_version=14,
+        )
+
+    print("🗜️  Quantizing weights to int8...")
+    quantize_dynamic(fp32_path, os.path.join(output_dir, ONNX_MODEL_FILE), weight_type=QuantType.QInt8)
+    os.remove(fp32_path)
+
+    tokenizer.backend_tokenizer.save(os.path.join(output_dir, TOKENIZER_FILE))
+
+    size_mb = os.path.getsize(os.path.join(output_dir, ONNX_MODEL_FILE)) / 1024 / 1024
+    print(f"✅ Saved {ONNX_MODEL_FILE} ({size_mb:.1f} MB) and {TOKENIZER_FILE} to {output_dir}")
+    print("   Set EMBEDDING_BACKEND=onnx and EMBEDDING_ONNX_PATH to use it")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", default=settings.EMBEDDING_MODEL)
+    parser.add_argument("--output", default=settings.EMBEDDING_ONNX_PATH)
+    args = parser.parse_args()
+    export(args.model, args.output)
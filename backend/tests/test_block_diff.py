@@ -0,0 +1,21 @@
+from app.services.block_diff import diff_blocks
+
+
+def test_added_block_with_context():
+    assert diff_blocks(["a", "b", "c"], ["a", "x", "b", "c"]) == ["  a", "+ x", "  b"]
+
+
+def test_changed_block_shows_old_and_new():
+    assert diff_blocks(["a", "b"], ["a", "z"]) == ["  a", "- b", "+ z"]
+
+
+def test_removed_blocks_are_unchanged():
+    assert diff_blocks(["a", "b", "c"], ["a", "c"]) == []
+
+
+def test_reordered_blocks_are_unchanged():
+    assert diff_blocks(["a", "b", "c"], ["c", "a"]) == []
+
+
+def test_moved_block_is_context_next_to_new_one():
+    assert diff_blocks(["h", "a", "b"], ["h", "b", "n", "a"]) == ["  h", "  b", "+ n", "  a"]
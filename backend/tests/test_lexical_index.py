@@ -0,0 +1,25 @@
+from app.services.lexical_index import BM25Index, is_exact_token, tokenize
+
+
+def exact_tokens(query):
+    return [token for token in tokenize(query) if is_exact_token(token)]
+
+
+def test_inn_amount_and_sku_are_exact():
+    assert exact_tokens("ИНН 7707083893, счёт на 15 000 руб, артикул ab12-x") == ["7707083893", "15000", "ab12"]
+
+
+def test_query_with_year_is_not_exact():
+    assert exact_tokens("Какая выручка была в 2024 году?") == []
+    assert exact_tokens("отчёт за 2023г") == []
+
+
+def test_short_numbers_are_not_exact():
+    assert exact_tokens("заказ на 500 штук, 1200 рублей") == []
+
+
+def test_bm25_require_filters_to_exact_matches():
+    index = BM25Index()
+    index.add("a", "Оплата по счёту 15 000 руб")
+    index.add("b", "Оплата по счёту 20 000 руб")
+    assert [doc_id for doc_id, _ in index.search("счёт 15000", require=["15000"])] == ["a"]